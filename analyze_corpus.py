@@ -0,0 +1,72 @@
+'''
+Screen a corpus of MIDI scores for bandoneon playability.
+
+For every file, report the note range, maximum polyphony, the notes no button
+plays on the draw or on the push, and how often a chord forces the bellows
+direction (or cannot be played at all).
+
+    python analyze_corpus.py scores/*.mid --channels 3,4,7
+'''
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+import logging
+import multiprocessing
+import os
+import time
+
+from bandoneon.corpus import analyze_file
+
+
+def _percent(count, total):
+    return f'{100 * count / total:.1f}%' if total else '-'
+
+
+def print_table(summaries, per_channel=False):
+    print(f'{"file":30} {"notes":>6} {"range":>8} {"poly":>4} '
+          f'{"!draw":>5} {"!push":>5} {"forced":>7} {"imposs":>7}')
+    for s in summaries:
+        name = os.path.basename(s['file'])[:30]
+        range_ = f'{s["min_midi"]}-{s["max_midi"]}' if s['notes'] else '-'
+        forced = s['forced_draw'] + s['forced_push']
+        print(f'{name:30} {s["notes"]:>6} {range_:>8} '
+              f'{s["max_polyphony"]:>4} {len(s["unplayable_draw"]):>5} '
+              f'{len(s["unplayable_push"]):>5} '
+              f'{_percent(forced, s["states"]):>7} '
+              f'{_percent(s["impossible"], s["states"]):>7}')
+        if not per_channel:
+            continue
+        for ch, c in sorted(s['channels'].items()):
+            range_ = f'{c["min_midi"]}-{c["max_midi"]}'
+            print(f'  channel {ch:<20} {"":>6} {range_:>8} '
+                  f'{c["max_polyphony"]:>4}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('files', nargs='+')
+    parser.add_argument('--channels',
+                        help='comma separated MIDI channels to analyze')
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--per-channel', action='store_true',
+                        help='also print the range and polyphony per channel')
+    parser.add_argument('--debug', action='store_true')
+    args = parser.parse_args()
+
+    if args.debug:
+        logging.basicConfig(level=logging.DEBUG)
+
+    channels = None
+    if args.channels:
+        channels = set(int(c) for c in args.channels.split(','))
+
+    start = time.perf_counter()
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(args.workers, mp_context=context) as pool:
+        summaries = list(pool.map(partial(analyze_file, channels=channels),
+                                  args.files))
+    elapsed = time.perf_counter() - start
+
+    print_table(summaries, args.per_channel)
+    print(f'\n{len(summaries)} files in {elapsed:.2f}s '
+          f'({len(summaries) / elapsed:.1f} files/sec)')
@@ -0,0 +1,46 @@
+'''
+Measure the loudness of every sample under SOUND_DIRECTORY, and any
+synthesized notes, and write the normalization gains to the sample index.
+
+    python analyze_loudness.py
+'''
+import argparse
+import logging
+import os
+import time
+
+from bandoneon import button, loudness
+
+
+def _wav_files(directory):
+    if not os.path.isdir(directory):
+        return []
+    return sorted(
+        os.path.join(directory, f)
+        for f in os.listdir(directory)
+        if f.lower().endswith('.wav')
+    )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--debug', action='store_true')
+    args = parser.parse_args()
+
+    if args.debug:
+        logging.basicConfig(level=logging.DEBUG)
+
+    # synthesizes any missing notes, so they are measured too
+    button.init_buttons(args.workers)
+    file_paths = (_wav_files(button._SOUND_DIR)
+                  + _wav_files(button._SYNTH_DIR))
+    start = time.perf_counter()
+    index = loudness.build_index(file_paths, args.workers)
+    elapsed = time.perf_counter() - start
+
+    gains = sorted(entry['gain'] for entry in index.values())
+    print(f'{len(index)} samples measured in {elapsed:.2f}s')
+    if gains:
+        print(f'gain min {gains[0]:.3f}, median {gains[len(gains) // 2]:.3f}, '
+              f'max {gains[-1]:.3f}')
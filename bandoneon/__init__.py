@@ -2,25 +2,92 @@
 Bandoneon main application.
 '''
 import logging
-from posix_ipc import MessageQueue, O_CREAT
+import os
+import time
 
-from . import bellows, button
-from .message import parse_message
+from posix_ipc import MessageQueue, O_CREAT, SignalError
+
+from . import bellows, button, journal, pipeline, profiler, server
+from .message import InvalidMessage, parse_message
 from .sound import Sound, get_sound
 
 
 MESSAGE_Q_PATH = '/bandoneon'
 
+# Where input comes from: the POSIX message queue or the input socket server
+_QUEUE = 'queue'
+_SOCKET = 'socket'
+_INPUT_MODE = os.getenv('BANDONEON_INPUT', _QUEUE)
+
+# Run the staged <pipeline> rather than the sequential loop
+_PIPELINE = os.getenv('BANDONEON_PIPELINE') == '1'
+
+_JOURNAL_PATH = os.getenv('BANDONEON_JOURNAL')
+
 
-_message_queue = MessageQueue(MESSAGE_Q_PATH, flags=O_CREAT, max_messages=1,
-                              read=True, write=False)
+def _open_queue():
+    return MessageQueue(MESSAGE_Q_PATH, flags=O_CREAT, max_messages=1,
+                        read=True, write=False)
 
 
-def start_loop():
+def _receive_messages():
+    message_queue = _open_queue()
+    while True:
+        try:
+            msg, _ = message_queue.receive()
+        except SignalError:
+            # interrupted by a signal handler, eg. the profiler dump
+            continue
+        yield msg
+
+
+def start_loop(source=None, sound_class=Sound):
     '''
     Main program loop. Read from input buttons and bellows value, evaluate
     current volume and adjust accordingly.
+
+    source - iterable of raw messages, defaults to the message queue or,
+             when BANDONEON_INPUT=socket, an <server.InputServer>
+    sound_class - <SoundABC> implementation used to play buttons
+
+    When BANDONEON_JOURNAL is set, every received message is appended to that
+    journal file. When BANDONEON_PROFILE is set, the loop is profiled (see
+    <profiler>). When BANDONEON_PIPELINE=1, messages are handled by the staged
+    <pipeline> instead of sequentially. The loop returns once source is
+    exhausted.
+
+    The buttons, the sound backend and the message queue are only set up
+    here, so importing the package has no side effects.
     '''
+    button.init_buttons()
+    sound_class.init()
+    input_server = None
+    if source is None and _INPUT_MODE == _SOCKET:
+        input_server = server.InputServer()
+        input_server.start()
+        source = input_server.messages()
+    elif source is None:
+        source = _receive_messages()
+    writer = None
+    if _JOURNAL_PATH:
+        writer = journal.JournalWriter(_JOURNAL_PATH)
+        source = journal.record(source, writer)
+    sampler = profiler.start()
+    try:
+        if _PIPELINE:
+            pipeline.run(source, sound_class)
+        else:
+            _run_loop(source, sound_class)
+    finally:
+        if input_server:
+            input_server.stop()
+        if writer:
+            writer.close()
+        if sampler:
+            sampler.stop()
+
+
+def _run_loop(source, sound_class):
     # <Button> to <Sound> mapping
     active_buttons = {}
 
@@ -30,9 +97,18 @@ def start_loop():
     bellows_mode = bellows.OPEN
     volume = 0
 
-    while True:
-        msg, _ = _message_queue.receive()
-        bttn_msg, bellow_msg = parse_message(msg)
+    stats = profiler.stats
+    for msg in source:
+        stats.iterations += 1
+        start = time.perf_counter()
+        try:
+            bttn_msg, bellow_msg = parse_message(msg)
+        except InvalidMessage as e:
+            stats.invalid += 1
+            logging.warning(f'Ignoring message: {e}')
+            continue
+        finally:
+            stats.parse_seconds += time.perf_counter() - start
 
         if bttn_msg:
             logging.debug(f'Button Msg: {bttn_msg.str()}')
@@ -45,7 +121,8 @@ def start_loop():
                 del active_buttons[bttn]
             for bttn in buttons_to_start:
                 try:
-                    sound = get_sound(bttn.get_file(bellows_value), Sound)
+                    sound = get_sound(bttn.get_file(bellows_value),
+                                      sound_class)
                 except IndexError:
                     continue
                 active_buttons[bttn] = sound
@@ -65,7 +142,7 @@ def start_loop():
                     try:
                         new_sound = get_sound(
                             bttn.get_file(current_bellows_value),
-                            Sound
+                            sound_class
                         )
                     except IndexError:
                         continue
@@ -79,3 +156,8 @@ def start_loop():
             bellows_value = current_bellows_value
             bellows_mode = current_bellows_mode
             volume = current_volume
+
+        stats.active_voices = len(active_buttons)
+
+    for sound in active_buttons.values():
+        sound.stop()
@@ -12,14 +12,31 @@ _SLIDER = 'slider'
 _BAROMETRIC = 'barometric'
 _BELLOW_MODE = os.getenv('BANDONEON_BELLOWS', _VIRTUAL)
 
+MAX_PRESSURE = 127
+# Exponent of the pressure to volume curve, 1.0 being linear
+_CURVE = float(os.getenv('BANDONEON_BELLOWS_CURVE', '1.0'))
 
-def pressure_to_volume(bellow_pressure):
+
+def _volume_table(curve):
     '''
-    Translate a -127, 127 range value to a 0.0, 1.0 value.
+    Precompute the volume for every pressure, indexed by pressure + 127.
+    '''
+    return [
+        (abs(p) / MAX_PRESSURE) ** curve
+        for p in range(-MAX_PRESSURE, MAX_PRESSURE + 1)
+    ]
+
 
-    nb. MVP assumes a linear relation.
+_volume_lookup = _volume_table(_CURVE)
+
+
+def pressure_to_volume(bellow_pressure):
+    '''
+    Translate a -127, 127 range value to a 0.0, 1.0 value, by lookup in the
+    precomputed pressure curve. Out of range values are clamped.
     '''
-    return abs(bellow_pressure) / 127
+    p = max(-MAX_PRESSURE, min(MAX_PRESSURE, bellow_pressure))
+    return _volume_lookup[p + MAX_PRESSURE]
 
 
 def pressure_to_mode(bellow_pressure):
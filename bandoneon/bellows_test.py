@@ -0,0 +1,26 @@
+import unittest
+
+from . import bellows
+
+
+class TestPressureToVolume(unittest.TestCase):
+
+    def test_linear_by_default(self):
+        for p in (-127, -64, 0, 1, 100, 127):
+            self.assertAlmostEqual(bellows.pressure_to_volume(p), abs(p) / 127)
+
+    def test_out_of_range_is_clamped(self):
+        self.assertEqual(bellows.pressure_to_volume(300), 1.0)
+        self.assertEqual(bellows.pressure_to_volume(-300), 1.0)
+
+    def test_curve(self):
+        table = bellows._volume_table(2.0)
+        self.assertEqual(len(table), 255)
+        self.assertAlmostEqual(table[127 + 64], (64 / 127) ** 2)
+
+
+class TestPressureToMode(unittest.TestCase):
+
+    def test_modes(self):
+        self.assertEqual(bellows.pressure_to_mode(10), bellows.CLOSED)
+        self.assertEqual(bellows.pressure_to_mode(-10), bellows.OPEN)
@@ -4,71 +4,102 @@ Button related implementations.
 import logging
 import os
 import random
-import re
 
 from posix_ipc import MessageQueue, O_CREAT
 
+from . import layout, samples
+from .layout import InvalidNoteError
 
-_RE_HELMHOLTZ = re.compile('^([a-gA-G]#?)(`*)$')
-_note_map = {
-    'C': 0, 'C#': 1,
-    'D': 2, 'D#': 3,
-    'E': 4,
-    'F': 5, 'F#': 6,
-    'G': 7, 'G#': 8,
-    'A': 9, 'A#': 10,
-    'B': 11
-}
+
+_note_map = layout.NOTE_MAP
 
 _VIRTUAL = 'virtual'
 _IC2 = 'ic2'
 _KEY_MODE = os.getenv('BANDONEON_BUTTONS', _VIRTUAL)
 
 _SOUND_DIR = os.getenv('SOUND_DIRECTORY', 'sounds/transposed')
+# Notes missing from the sound dir are pitch shifted into here
+_SYNTH_DIR = os.getenv('BANDONEON_SYNTH_DIR', 'sounds/synth')
 
 _buttons = {}
 _socket = None
 
 
-# Prescan the sound dir to make a map of ISO note values to sound files
-# only take Pre1 sounds
-_file_list = os.listdir(_SOUND_DIR)
-_file_map = {
-    note: [f for f in _file_list if note in f and 'Pre2' in f and f.startswith('K')]
-    for note in [f'{n}{o}' for n in _note_map.keys() for o in range(7)]
-}
+# Filled in from the sound dirs by <init_buttons>
+# ISO note value to the sound files for it, only Pre2 takes
+_file_map = {}
+# MIDI note to octave value, for the notes that have recordings
+_recorded_midi = {}
+# Octave value to synthesized sample paths, for the notes without recordings
+_synth_map = {}
 
 
-class InvalidNoteError(Exception):
-    pass
+def _scan_sound_dir():
+    '''
+    Prescan the sound dir to make a map of ISO note values to sound files.
+    '''
+    global _file_map, _recorded_midi
+    file_list = os.listdir(_SOUND_DIR)
+    _file_map = {
+        note: [f for f in file_list
+               if note in f and 'Pre2' in f and f.startswith('K')]
+        for note in [f'{n}{o}' for n in _note_map.keys() for o in range(7)]
+    }
+    _recorded_midi = {
+        24 + _note_map[n] + 12 * o: f'{n}{o}'
+        for n in _note_map.keys() for o in range(7)
+        if _file_map[f'{n}{o}']
+    }
+
+
+def _nearest_recorded(midi):
+    '''
+    The recorded MIDI note closest to midi, preferring the lower one on ties.
+    '''
+    return min(_recorded_midi, key=lambda m: (abs(m - midi), m))
 
 
 class Note():
     '''
     A Note is a representation of a frequency, initiated with a
     helmholtz_value (eg. c#` indicates the MIDI note 61, or C3# or C4#
+
+    The octave value and MIDI note are parsed from helmholtz_value unless
+    given, as they are from the compiled <layout.Layout>.
     '''
 
-    def __init__(self, helmholtz_value):
+    def __init__(self, helmholtz_value, octave_value=None, midi=None):
         self.helmholtz_value = helmholtz_value
+        if octave_value is None or midi is None:
+            octave_value, _, midi = layout.parse_note(helmholtz_value)
+        self.octave_value = octave_value
+        self.midi = midi
 
-        m = _RE_HELMHOLTZ.search(helmholtz_value)
-        if not m:
-            raise InvalidNoteError(f'{helmholtz_value} failed to parse')
-        note = m.group(1)
-        octave_shift = m.group(2)
-        if note[0].isupper():
-            octave = 2
-        else:
-            octave = 3 + len(octave_shift)
-
-        self.octave_value_yamaha = f'{note.upper()}{octave - 1}'
-        self.octave_value = f'{note.upper()}{octave}'
-        self.midi = 24 + _note_map[note.upper()] + 12 * octave
+    @property
+    def octave_value_yamaha(self):
+        return f'{self.octave_value[:-1]}{int(self.octave_value[-1]) - 1}'
 
     def fname(self):
-        file_ = random.choice(_file_map[self.octave_value])
-        return os.path.join(_SOUND_DIR, file_)
+        files = _file_map.get(self.octave_value)
+        if files:
+            return os.path.join(_SOUND_DIR, random.choice(files))
+        return random.choice(_synth_map.get(self.octave_value, []))
+
+    def synthesis_job(self, file_=None):
+        '''
+        Return the (source path, semitones, file path) <samples.synthesize>
+        job pitch shifting this note from the nearest recorded note.
+
+        Raises IndexError when there are no recordings at all.
+        '''
+        if not _recorded_midi:
+            raise IndexError(f'No recordings to synthesize {self} from')
+        source_midi = _nearest_recorded(self.midi)
+        if file_ is None:
+            file_ = random.choice(_file_map[_recorded_midi[source_midi]])
+        return (os.path.join(_SOUND_DIR, file_),
+                self.midi - source_midi,
+                os.path.join(_SYNTH_DIR, f'{self.octave_value}_{file_}'))
 
     def __repr__(self):
         return f'[{self.midi}] {self.octave_value}'
@@ -86,13 +117,22 @@ class Button():
     note values are represented in Helmholtz Pitch notation:
     http://www.theoreticallycorrect.com/Helmholtz-Pitch-Numbering/
 
-    We parse and store them out to Octave Numbering and MIDI notes.
+    We parse and store them out to Octave Numbering and MIDI notes, or take
+    them from the tables of a compiled <layout.Layout> when given one.
     '''
 
-    def __init__(self, key_number, draw_value, push_value):
+    def __init__(self, key_number, draw_value, push_value, tables=None):
         self.key_number = key_number
-        self.draw_note = Note(draw_value)
-        self.push_note = Note(push_value)
+        if tables:
+            self.draw_note = Note(
+                draw_value, tables.slots[layout.DRAW][key_number],
+                tables.key_to_midi[layout.DRAW][key_number])
+            self.push_note = Note(
+                push_value, tables.slots[layout.PUSH][key_number],
+                tables.key_to_midi[layout.PUSH][key_number])
+        else:
+            self.draw_note = Note(draw_value)
+            self.push_note = Note(push_value)
 
     def get_file(self, bellows_value):
         note = self.push_note if bellows_value >= 0 else self.draw_note
@@ -111,6 +151,36 @@ class Button():
         return self.__repr__()
 
 
+def synthesize_missing(workers=None):
+    '''
+    Synthesize every take of every note the layout plays but the sound dir
+    lacks in a process pool, returning the paths of the synthesized files.
+    Takes that cannot be synthesized are logged and left out, a note without
+    any leaving its buttons silent.
+    '''
+    global _synth_map
+    notes = {}
+    for bttn in _buttons.values():
+        for note in (bttn.draw_note, bttn.push_note):
+            if not _file_map.get(note.octave_value):
+                notes[note.octave_value] = note
+    octave_values = []
+    jobs = []
+    if _recorded_midi:
+        for note in notes.values():
+            source_midi = _nearest_recorded(note.midi)
+            for file_ in _file_map[_recorded_midi[source_midi]]:
+                octave_values.append(note.octave_value)
+                jobs.append(note.synthesis_job(file_))
+    synth_map = {}
+    for octave_value, path in zip(octave_values,
+                                  samples.synthesize_all(jobs, workers)):
+        if path:
+            synth_map.setdefault(octave_value, []).append(path)
+    _synth_map = synth_map
+    return [path for paths in synth_map.values() for path in paths]
+
+
 def get_current_buttons_pushed(button_message):
     '''
     Given a <message.ButtonMessage>, return the <set> of currently pushed
@@ -149,103 +219,24 @@ def _init_buttons():
 
 def _init_virtual_buttons():
     '''
-    Create a module-level button context.
-    '''
-    button_maps = [
-        # left hand
-        # col 1
-        (0, 'D', 'E'),
-        # col 2
-        (1, 'B', 'e'),
-        (2, 'e', 'A'),
-        # col 3
-        (3, 'g`', 'f#`'),
-        (4, 'g#', 'e'),
-        (5, 'd', 'G'),
-        (6, 'E', 'D'),
-        # col 4
-        (7, 'a`', 'g#`'),
-        (8, 'b', 'a'),
-        (9, 'a', 'g'),
-        (10, 'A', 'd'),
-        # col 5
-        (11, 'd#`', 'b`'),
-        (12, 'd`', 'c#`'),
-        (13, 'c`', 'b'),
-        (14, 'g', 'a#'),
-        (15, 'G#', 'G#'),
-        # col 6
-        (16, 'f#', 'f'),
-        (17, 'f#`', 'e`'),
-        (18, 'e`', 'd`'),
-        (19, 'd#', 'c`'),
-        (20, 'A#', 'A#'),
-        # col 7
-        (21, 'D#', 'C#'),
-        (22, 'c#`', 'g#'),
-        (23, 'c', 'f`'),
-        (24, 'f`', 'c#'),
-        (25, 'c#', 'd#'),
-        # col 8
-        (26, 'C', 'F'),
-        (27, 'F#', 'B'),
-        (28, 'G', 'f#'),
-        (29, 'a#', 'c'),
-        (30, 'f', 'd#`'),
-        # col 9
-        (31, 'F', 'F#'),
-        (32, 'g#`', 'g`'),
-        # right hand
-        # col 1
-        (33, 'a#', 'a#'),
-        (34, 'a', 'a'),
-        # col 2
-        (35, 'd#`', 'd#`'),
-        (36, 'f`', 'f`'),
-        (37, 'b', 'b'),
-        # col 3
-        (38, 'f``', 'f``'),
-        (39, 'a#`', 'e`'),
-        (40, 'e`', 'f#`'),
-        (41, 'c`', 'd`'),
-        # col 4
-        (42, 'd#``', 'e``'),
-        (43, 'g#`', 'a`'),
-        (44, 'c#``', 'f#``'),
-        (45, 'd`', 'c#'),
-        (46, 'c#`', 'c`'),
-        # col 5
-        (47, 'f#``', 'g#``'),
-        (48, 'b`', 'c#``'),
-        (49, 'f#`', 'g`'),
-        (50, 'g`', 'g#`'),
-        (51, 'a```', 'g```'),
-        (52, 'b```', 'a```'),
-        # col 6
-        (53, 'a``', 'b``'),
-        (54, 'd``', 'b`'),
-        (55, 'a`', 'b`'),
-        (56, 'a#``', 'a#`'),
-        (57, 'f#```', 'a#``'),
-        (58, 'g#```', 'g#```'),
-        # col 7
-        (59, 'c#```', 'e```'),
-        (60, 'g#``', 'a``'),
-        (61, 'c``', 'd``'),
-        (62, 'c```', 'c``'),
-        (63, 'e```', 'c```'),
-        (64, 'g```', 'f#```'),
-        # col 8
-        (65, 'g``', 'd#``'),
-        (66, 'b``', 'c#```'),
-        (67, 'e``', 'g``'),
-        (68, 'd```', 'd```'),
-        (69, 'd#```', 'd#```'),
-        (70, 'f```', 'f```'),
-    ]
+    Create a module-level button context from the BANDONEON_LAYOUT layout.
+    '''
     global _buttons
-    for bttn_key, draw, push in button_maps:
-        _buttons[bttn_key] = Button(bttn_key, draw, push)
+    _buttons = {}
+    tables = layout.load()
+    for bttn_key, draw, push in tables.buttons:
+        _buttons[bttn_key] = Button(bttn_key, draw, push, tables)
+
 
+def init_buttons(workers=None):
+    '''
+    Scan the sound dir, create the buttons and synthesize the notes the sound
+    dir lacks with a pool of workers, so that looking up a sample never
+    writes one.
 
-_init_buttons()
+    This is done at startup rather than on import, so that tools which only
+    need the layout or the parsers run without a sample library.
+    '''
+    _scan_sound_dir()
+    _init_buttons()
+    synthesize_missing(workers)
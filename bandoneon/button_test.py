@@ -0,0 +1,85 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+import wave
+
+from . import button, layout
+
+
+class TestSynthesizedNotes(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        sound_dir = os.path.join(self.directory, 'transposed')
+        os.makedirs(sound_dir)
+        for name in ('K_C3_Pre2.wav', 'K_E3_Pre2.wav'):
+            with wave.open(os.path.join(sound_dir, name), 'wb') as w:
+                w.setnchannels(1)
+                w.setsampwidth(2)
+                w.setframerate(44100)
+                w.writeframes(bytes(200))
+
+        patches = {
+            '_SOUND_DIR': sound_dir,
+            '_SYNTH_DIR': os.path.join(self.directory, 'synth'),
+            '_file_map': {'C3': ['K_C3_Pre2.wav'], 'E3': ['K_E3_Pre2.wav']},
+            '_recorded_midi': {60: 'C3', 64: 'E3'},
+            '_synth_map': {},
+            # draws the recorded c and pushes the missing d
+            '_buttons': {0: button.Button(0, 'c', 'd')},
+        }
+        for name, value in patches.items():
+            patcher = mock.patch.object(button, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_nearest_recorded_prefers_lower_on_ties(self):
+        self.assertEqual(button._nearest_recorded(61), 60)
+        self.assertEqual(button._nearest_recorded(62), 60)
+        self.assertEqual(button._nearest_recorded(63), 64)
+        self.assertEqual(button._nearest_recorded(90), 64)
+
+    def test_missing_note_falls_back_to_synthesized(self):
+        d = button.Note('d')
+        with self.assertRaises(IndexError):
+            d.fname()
+
+        synthesized = os.path.join(self.directory, 'synth',
+                                   'D3_K_C3_Pre2.wav')
+        self.assertEqual(button.synthesize_missing(), [synthesized])
+        self.assertEqual(d.fname(), synthesized)
+        self.assertEqual(
+            button.Note('c').fname(),
+            os.path.join(self.directory, 'transposed', 'K_C3_Pre2.wav'))
+
+    def test_undecodable_recording_only_skips_its_notes(self):
+        with open(os.path.join(button._SOUND_DIR, 'K_G3_Pre2.wav'), 'wb') as f:
+            f.write(b'RIFF')
+        button._file_map['G3'] = ['K_G3_Pre2.wav']
+        button._recorded_midi[67] = 'G3'
+        # a is pitch shifted from the unreadable g
+        button._buttons[1] = button.Button(1, 'a', 'd')
+
+        with self.assertLogs(level='WARNING'):
+            synthesized = button.synthesize_missing(workers=1)
+        self.assertEqual(synthesized, [
+            os.path.join(self.directory, 'synth', 'D3_K_C3_Pre2.wav')])
+        with self.assertRaises(IndexError):
+            button.Note('a').fname()
+
+
+class TestButton(unittest.TestCase):
+
+    def test_compiled_layout_matches_parsing(self):
+        with open(layout._layout_path('argentine'), 'rb') as f:
+            tables = layout.compile_layout(f.read())
+        for key, draw, push in tables.buttons:
+            bttn = button.Button(key, draw, push, tables)
+            for note, value in ((bttn.draw_note, draw),
+                                (bttn.push_note, push)):
+                self.assertEqual(
+                    (note.octave_value, note.octave_value_yamaha, note.midi),
+                    layout.parse_note(value))
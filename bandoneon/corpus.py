@@ -0,0 +1,112 @@
+'''
+Vectorized playability analysis of MIDI scores against the button layout.
+
+A score is flattened into parallel arrays of note events (time, channel,
+note, +1 on / -1 off). Cumulatively summing the events over a 128 column note
+matrix gives which notes sound after every instant, and from that the
+polyphony and which bellows direction, if any, can play each chord.
+'''
+import mido
+import numpy as np
+
+from . import layout
+
+
+def layout_masks():
+    '''
+    Return (draw, push) boolean arrays over the 128 MIDI notes, True where a
+    button plays that note in that direction.
+    '''
+    tables = layout.load()
+    draw = np.zeros(128, dtype=bool)
+    push = np.zeros(128, dtype=bool)
+    draw[list(tables.midi_to_keys[layout.DRAW])] = True
+    push[list(tables.midi_to_keys[layout.PUSH])] = True
+    return draw, push
+
+
+def load_note_events(file_path, channels=None):
+    '''
+    Return (time, channel, note, delta) arrays for the note events of a MIDI
+    file, optionally only those on the given set of channels.
+    '''
+    events = []
+    now = 0.0
+    for message in mido.MidiFile(file_path):
+        now += message.time
+        if message.type not in ('note_on', 'note_off'):
+            continue
+        if channels is not None and message.channel not in channels:
+            continue
+        on = message.type == 'note_on' and message.velocity > 0
+        events.append((now, message.channel, message.note, 1 if on else -1))
+
+    if not events:
+        events = np.zeros((0, 4))
+    arr = np.array(events, dtype=np.float64)
+    return (arr[:, 0], arr[:, 1].astype(np.int8), arr[:, 2].astype(np.int64),
+            arr[:, 3].astype(np.int16))
+
+
+def sounding(time, note, delta):
+    '''
+    Return a states x 128 boolean matrix of the notes sounding after each
+    distinct event time. Note offs sort before note ons at the same instant
+    so that repeated notes do not overlap.
+    '''
+    order = np.lexsort((delta, time))
+    time, note, delta = time[order], note[order], delta[order]
+    changes = np.zeros((len(note), 128), dtype=np.int16)
+    changes[np.arange(len(note)), note] = delta
+    active = np.cumsum(changes, axis=0) > 0
+    # only the state after the last event at each instant is ever heard
+    last = np.append(time[1:] != time[:-1], True) if len(time) else []
+    return active[last]
+
+
+def analyze(time, channel, note, delta, draw_mask, push_mask):
+    '''
+    Summarize the playability of one score's note events.
+    '''
+    active = sounding(time, note, delta)
+    draw_ok = ~(active & ~draw_mask).any(axis=1)
+    push_ok = ~(active & ~push_mask).any(axis=1)
+    heard = active.any(axis=1)
+
+    played = np.unique(note[delta > 0])
+    summary = {
+        'notes': int((delta > 0).sum()),
+        'min_midi': int(played.min()) if len(played) else None,
+        'max_midi': int(played.max()) if len(played) else None,
+        'max_polyphony': int(active.sum(axis=1).max()) if len(active) else 0,
+        'unplayable_draw': played[~draw_mask[played]].tolist(),
+        'unplayable_push': played[~push_mask[played]].tolist(),
+        'states': int(heard.sum()),
+        'forced_draw': int((heard & draw_ok & ~push_ok).sum()),
+        'forced_push': int((heard & push_ok & ~draw_ok).sum()),
+        'impossible': int((heard & ~draw_ok & ~push_ok).sum()),
+        'channels': {},
+    }
+
+    for ch in np.unique(channel):
+        on_channel = channel == ch
+        ch_notes = note[on_channel & (delta > 0)]
+        ch_active = sounding(time[on_channel], note[on_channel],
+                             delta[on_channel])
+        summary['channels'][int(ch)] = {
+            'min_midi': int(ch_notes.min()) if len(ch_notes) else None,
+            'max_midi': int(ch_notes.max()) if len(ch_notes) else None,
+            'max_polyphony': int(ch_active.sum(axis=1).max()),
+        }
+    return summary
+
+
+def analyze_file(file_path, channels=None):
+    '''
+    Load and analyze a MIDI file, suitable for running in a process pool.
+    '''
+    draw_mask, push_mask = layout_masks()
+    events = load_note_events(file_path, channels)
+    summary = analyze(*events, draw_mask, push_mask)
+    summary['file'] = file_path
+    return summary
@@ -0,0 +1,67 @@
+import unittest
+
+import numpy as np
+
+from . import corpus
+
+
+def _events(rows):
+    arr = np.array(rows, dtype=np.float64)
+    return (arr[:, 0], arr[:, 1].astype(np.int8), arr[:, 2].astype(np.int64),
+            arr[:, 3].astype(np.int16))
+
+
+class TestSounding(unittest.TestCase):
+
+    def test_repeated_note_does_not_overlap(self):
+        time, _, note, delta = _events([
+            (0, 0, 60, 1),
+            (1, 0, 60, 1),
+            (1, 0, 60, -1),
+            (2, 0, 60, -1),
+        ])
+        active = corpus.sounding(time, note, delta)
+        self.assertEqual(active.shape, (3, 128))
+        self.assertEqual(active[:, 60].tolist(), [True, True, False])
+
+    def test_chord_onset_is_one_state(self):
+        time, _, note, delta = _events([
+            (0, 0, 60, 1),
+            (0, 0, 64, 1),
+            (0, 0, 67, 1),
+        ])
+        active = corpus.sounding(time, note, delta)
+        self.assertEqual(active.sum(axis=1).tolist(), [3])
+
+
+class TestAnalyze(unittest.TestCase):
+
+    def setUp(self):
+        self.draw = np.zeros(128, dtype=bool)
+        self.push = np.zeros(128, dtype=bool)
+        self.draw[[60, 62]] = True
+        self.push[[60, 64]] = True
+
+    def test_forced_and_impossible(self):
+        events = _events([
+            (0, 1, 60, 1),   # either direction
+            (1, 1, 62, 1),   # draw only
+            (2, 1, 62, -1),
+            (2, 2, 64, 1),   # push only
+            (3, 2, 66, 1),   # nowhere
+            (4, 1, 60, -1),
+            (4, 2, 64, -1),
+            (4, 2, 66, -1),
+        ])
+        s = corpus.analyze(*events, self.draw, self.push)
+        self.assertEqual(s['notes'], 4)
+        self.assertEqual((s['min_midi'], s['max_midi']), (60, 66))
+        self.assertEqual(s['max_polyphony'], 3)
+        self.assertEqual(s['unplayable_draw'], [64, 66])
+        self.assertEqual(s['unplayable_push'], [62, 66])
+        self.assertEqual(s['states'], 4)
+        self.assertEqual(s['forced_draw'], 1)
+        self.assertEqual(s['forced_push'], 1)
+        self.assertEqual(s['impossible'], 1)
+        self.assertEqual(s['channels'][2]['max_polyphony'], 2)
+        self.assertEqual(s['channels'][1]['min_midi'], 60)
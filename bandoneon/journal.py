@@ -0,0 +1,121 @@
+'''
+Input journal: a compact binary record of every raw message the main loop
+receives, and the tools to replay one.
+
+Each record is a little-endian float64 receive timestamp and a uint16 message
+length, followed by the raw message bytes.
+'''
+import logging
+import queue
+import struct
+import threading
+import time
+
+
+RECORD = struct.Struct('<dH')
+
+_BUFFER_BYTES = 64 * 1024
+_MAX_PENDING = 4096
+
+
+class JournalWriter():
+    '''
+    Appends records to a journal file from a background thread, so that
+    writing never blocks the caller. When the writer falls too far behind,
+    records are dropped and counted rather than waited on, as are records
+    that fail to write, eg. on a full disk.
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        self.dropped = 0
+        self._pending = queue.Queue(maxsize=_MAX_PENDING)
+        self._file = open(path, 'ab', buffering=_BUFFER_BYTES)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def write(self, timestamp, msg):
+        try:
+            self._pending.put_nowait((timestamp, msg))
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self):
+        self._pending.put(None)
+        self._thread.join()
+        if self.dropped:
+            logging.warning(f'Journal {self.path} dropped {self.dropped} msgs')
+
+    def _run(self):
+        failed = False
+        while True:
+            record = self._pending.get()
+            if record is None:
+                break
+            timestamp, msg = record
+            try:
+                # pack first, so that a message too long for the header
+                # leaves nothing half written
+                self._file.write(RECORD.pack(timestamp, len(msg)) + msg)
+            except (OSError, struct.error) as e:
+                # keep draining, or close() would wait on a full queue
+                self.dropped += 1
+                if not failed:
+                    failed = True
+                    logging.error(f'Journal {self.path} write failed: {e}')
+        try:
+            self._file.close()
+        except OSError as e:
+            logging.error(f'Journal {self.path} close failed: {e}')
+
+
+def read_journal(path):
+    '''
+    Yield (timestamp, raw message) tuples from a journal file.
+    '''
+    with open(path, 'rb') as f:
+        while True:
+            header = f.read(RECORD.size)
+            if len(header) < RECORD.size:
+                return
+            timestamp, length = RECORD.unpack(header)
+            yield timestamp, f.read(length)
+
+
+def record(source, writer):
+    '''
+    Pass raw messages through from source, journaling each on the way.
+    '''
+    for msg in source:
+        writer.write(time.time(), msg)
+        yield msg
+
+
+def replay(path, speed=1.0):
+    '''
+    Yield the raw messages of a journal with their original spacing divided
+    by speed. A speed of 0 replays as fast as possible.
+    '''
+    start = None
+    first = None
+    for timestamp, msg in read_journal(path):
+        if start is None:
+            start = time.perf_counter()
+            first = timestamp
+        if speed:
+            due = start + (timestamp - first) / speed
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        yield msg
+
+
+def timed(source, timings):
+    '''
+    Pass raw messages through from source, appending (raw message, seconds)
+    to timings for the time the consumer spent on each one.
+    '''
+    for msg in source:
+        start = time.perf_counter()
+        yield msg
+        timings.append((msg, time.perf_counter() - start))
@@ -0,0 +1,61 @@
+import os
+import tempfile
+import unittest
+
+from . import journal
+
+
+class TestJournal(unittest.TestCase):
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp()
+        os.close(fd)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_round_trip(self):
+        msgs = [b'btn:1,2,3', b'blw:-100', b'btn:']
+        writer = journal.JournalWriter(self.path)
+        for i, msg in enumerate(msgs):
+            writer.write(float(i), msg)
+        writer.close()
+        got = list(journal.read_journal(self.path))
+        self.assertEqual(got, [(float(i), m) for i, m in enumerate(msgs)])
+
+    def test_oversized_message_is_dropped(self):
+        writer = journal.JournalWriter(self.path)
+        with self.assertLogs(level='ERROR'):
+            writer.write(0.0, b'x' * 70000)
+            writer.write(1.0, b'btn:1')
+            writer.close()
+        self.assertEqual(writer.dropped, 1)
+        self.assertEqual(list(journal.read_journal(self.path)),
+                         [(1.0, b'btn:1')])
+
+    @unittest.skipUnless(os.path.exists('/dev/full'), 'needs /dev/full')
+    def test_full_disk_does_not_block_close(self):
+        writer = journal.JournalWriter('/dev/full')
+        with self.assertLogs(level='ERROR'):
+            for i in range(1000):
+                writer.write(float(i), b'blw:100' * 20)
+            writer.close()
+        self.assertGreater(writer.dropped, 0)
+
+    def test_record_passes_through(self):
+        writer = journal.JournalWriter(self.path)
+        got = list(journal.record(iter([b'blw:1', b'blw:2']), writer))
+        writer.close()
+        self.assertEqual(got, [b'blw:1', b'blw:2'])
+        self.assertEqual(
+            [m for _, m in journal.read_journal(self.path)], got)
+
+    def test_replay_as_fast_as_possible(self):
+        writer = journal.JournalWriter(self.path)
+        writer.write(0.0, b'btn:1')
+        writer.write(3600.0, b'btn:')
+        writer.close()
+        timings = []
+        got = list(journal.timed(journal.replay(self.path, speed=0), timings))
+        self.assertEqual(got, [b'btn:1', b'btn:'])
+        self.assertEqual([m for m, _ in timings], got)
@@ -0,0 +1,138 @@
+'''
+Declarative button layouts.
+
+A layout is a JSON file listing, for every button, its key number and the
+note it plays on the draw and on the push in Helmholtz notation:
+
+    {"name": "...", "buttons": [
+        {"key": 0, "hand": "left", "column": 1, "draw": "D", "push": "E"},
+        ...
+    ]}
+
+Layouts are compiled once into lookup tables and the compiled tables are
+cached, keyed on the layout file's content and the compiled format.
+BANDONEON_LAYOUT picks the layout, either by name from the layouts directory
+or as a path to a JSON file.
+'''
+import functools
+import hashlib
+import json
+import os
+import pickle
+import re
+
+
+DRAW = 'draw'
+PUSH = 'push'
+
+LAYOUT = os.getenv('BANDONEON_LAYOUT', 'argentine')
+
+_LAYOUT_DIR = os.path.join(os.path.dirname(__file__), 'layouts')
+_CACHE_DIR = os.path.join(os.getenv('BANDONEON_CACHE_DIR', 'sounds/cache'),
+                          'layouts')
+# Part of the cache key, bump it whenever <Layout> changes shape so that
+# stale pickles are recompiled rather than loaded
+_CACHE_VERSION = 1
+
+_RE_HELMHOLTZ = re.compile('^([a-gA-G]#?)(`*)$')
+NOTE_MAP = {
+    'C': 0, 'C#': 1,
+    'D': 2, 'D#': 3,
+    'E': 4,
+    'F': 5, 'F#': 6,
+    'G': 7, 'G#': 8,
+    'A': 9, 'A#': 10,
+    'B': 11
+}
+
+
+class InvalidNoteError(Exception):
+    pass
+
+
+def parse_note(helmholtz_value):
+    '''
+    Parse a Helmholtz pitch (eg. c#`) into a tuple of
+    (octave value, yamaha octave value, MIDI note), eg. ('C#4', 'C#3', 73).
+    '''
+    m = _RE_HELMHOLTZ.search(helmholtz_value)
+    if not m:
+        raise InvalidNoteError(f'{helmholtz_value} failed to parse')
+    note = m.group(1)
+    octave_shift = m.group(2)
+    if note[0].isupper():
+        octave = 2
+    else:
+        octave = 3 + len(octave_shift)
+
+    return (
+        f'{note.upper()}{octave}',
+        f'{note.upper()}{octave - 1}',
+        24 + NOTE_MAP[note.upper()] + 12 * octave,
+    )
+
+
+class Layout():
+    '''
+    Lookup tables compiled from a layout file.
+
+    buttons - [(key, draw helmholtz, push helmholtz)] in file order
+    key_to_midi - {direction: {key: MIDI note}}
+    midi_to_keys - {direction: {MIDI note: [every key playing it]}}
+    slots - {direction: {key: octave value}}, the sample slot for each key
+    '''
+
+    def __init__(self, name, buttons):
+        self.name = name
+        self.buttons = buttons
+        self.key_to_midi = {DRAW: {}, PUSH: {}}
+        self.midi_to_keys = {DRAW: {}, PUSH: {}}
+        self.slots = {DRAW: {}, PUSH: {}}
+        for key, draw, push in buttons:
+            for direction, value in ((DRAW, draw), (PUSH, push)):
+                octave_value, _, midi = parse_note(value)
+                self.key_to_midi[direction][key] = midi
+                self.midi_to_keys[direction].setdefault(midi, []).append(key)
+                self.slots[direction][key] = octave_value
+
+
+def _layout_path(name):
+    if os.path.exists(name):
+        return name
+    return os.path.join(_LAYOUT_DIR, f'{name}.json')
+
+
+def compile_layout(raw):
+    '''
+    Compile the bytes of a layout file into a <Layout>.
+    '''
+    data = json.loads(raw)
+    buttons = [(b['key'], b['draw'], b['push']) for b in data['buttons']]
+    return Layout(data['name'], buttons)
+
+
+@functools.lru_cache(maxsize=None)
+def load(name=LAYOUT):
+    '''
+    Return the compiled <Layout> for a layout name or path, from the compiled
+    cache when the layout file is unchanged.
+    '''
+    with open(_layout_path(name), 'rb') as f:
+        raw = f.read()
+    digest = hashlib.sha1(b'%d:%s' % (_CACHE_VERSION, raw)).hexdigest()
+    cache_path = os.path.join(_CACHE_DIR, f'{digest}.pickle')
+    try:
+        with open(cache_path, 'rb') as f:
+            return pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+        pass
+
+    compiled = compile_layout(raw)
+    try:
+        os.makedirs(_CACHE_DIR, exist_ok=True)
+        with open(cache_path, 'wb') as f:
+            pickle.dump(compiled, f)
+    except OSError:
+        # a read-only cache only costs a recompile
+        pass
+    return compiled
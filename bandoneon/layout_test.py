@@ -0,0 +1,76 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from . import layout
+
+
+class TestParseNote(unittest.TestCase):
+
+    def test_helmholtz(self):
+        self.assertEqual(layout.parse_note('c#`'), ('C#4', 'C#3', 73))
+        self.assertEqual(layout.parse_note('c'), ('C3', 'C2', 60))
+        self.assertEqual(layout.parse_note('D'), ('D2', 'D1', 50))
+
+    def test_invalid(self):
+        with self.assertRaises(layout.InvalidNoteError):
+            layout.parse_note('h')
+
+
+class TestLayout(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir)
+        patcher = mock.patch.object(layout, '_CACHE_DIR', self.cache_dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        layout.load.cache_clear()
+        self.addCleanup(layout.load.cache_clear)
+
+    def test_shared_notes_keep_every_key(self):
+        compiled = layout.compile_layout(json.dumps({
+            'name': 'test',
+            'buttons': [
+                {'key': 0, 'draw': 'a', 'push': 'b'},
+                {'key': 1, 'draw': 'a', 'push': 'c'},
+            ],
+        }))
+        self.assertEqual(compiled.midi_to_keys[layout.DRAW], {69: [0, 1]})
+        self.assertEqual(compiled.key_to_midi[layout.PUSH], {0: 71, 1: 60})
+        self.assertEqual(compiled.slots[layout.PUSH], {0: 'B3', 1: 'C3'})
+
+    def test_default_layout(self):
+        compiled = layout.load('argentine')
+        self.assertEqual(len(compiled.buttons), 71)
+        self.assertEqual(compiled.buttons[0], (0, 'D', 'E'))
+
+    def test_load_from_path_is_cached(self):
+        fd, path = tempfile.mkstemp(suffix='.json')
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'name': 'one', 'buttons': [
+                {'key': 7, 'draw': 'g', 'push': 'g'}]}, f)
+        self.addCleanup(os.remove, path)
+        first = layout.load(path)
+        self.assertIs(layout.load(path), first)
+        self.assertEqual(first.key_to_midi[layout.DRAW], {7: 67})
+
+    def test_compiled_cache_is_keyed_on_version(self):
+        compiled = layout.load('argentine')
+        cached = os.listdir(self.cache_dir)
+        self.assertEqual(len(cached), 1)
+
+        layout.load.cache_clear()
+        reloaded = layout.load('argentine')
+        self.assertIsNot(reloaded, compiled)
+        self.assertEqual(reloaded.slots, compiled.slots)
+        self.assertEqual(os.listdir(self.cache_dir), cached)
+
+        layout.load.cache_clear()
+        with mock.patch.object(layout, '_CACHE_VERSION',
+                               layout._CACHE_VERSION + 1):
+            layout.load('argentine')
+        self.assertEqual(len(os.listdir(self.cache_dir)), 2)
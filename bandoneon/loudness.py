@@ -0,0 +1,88 @@
+'''
+Offline loudness analysis of the sample library.
+
+Recording levels vary from sample to sample. Rather than measuring audio on
+the hot path, an offline pass records each sample's RMS and peak level in the
+sample index along with a normalization gain, and <sound.Sound> multiplies
+its volume by that gain.
+'''
+from concurrent.futures import ProcessPoolExecutor
+import json
+import multiprocessing
+import os
+
+import numpy as np
+
+from . import samples
+
+
+_INDEX_PATH = os.getenv('BANDONEON_SAMPLE_INDEX', 'sounds/index.json')
+
+# Samples are normalized down to the RMS level at this percentile; the mixer
+# cannot amplify, so normalizing to the median would leave quiet ones short
+_TARGET_PERCENTILE = 10
+
+
+def measure(file_path):
+    '''
+    Return (rms, peak) of a sample, over all of its frames and channels.
+    '''
+    _, data = samples.read_wav(file_path)
+    if not data.size:
+        return 0.0, 0.0
+    return (float(np.sqrt(np.mean(np.square(data)))),
+            float(np.abs(data).max()))
+
+
+def gains(levels):
+    '''
+    Given {name: (rms, peak)}, return {name: gain} bringing every sample to
+    the target RMS level without exceeding full scale or unity gain.
+    '''
+    rms = np.array([r for r, _ in levels.values()])
+    audible = rms[rms > 0]
+    if not len(audible):
+        return {name: 1.0 for name in levels}
+    target = np.percentile(audible, _TARGET_PERCENTILE)
+    result = {}
+    for name, (r, peak) in levels.items():
+        gain = target / r if r > 0 else 1.0
+        if peak > 0:
+            gain = min(gain, 1.0 / peak)
+        result[name] = float(min(gain, 1.0))
+    return result
+
+
+def build_index(file_paths, workers=None):
+    '''
+    Measure every sample in a process pool and write the sample index, keyed
+    by file name. Returns the index.
+    '''
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(workers, mp_context=context) as pool:
+        measured = list(pool.map(measure, file_paths, chunksize=4))
+    levels = {
+        os.path.basename(path): level
+        for path, level in zip(file_paths, measured)
+    }
+    gain_map = gains(levels)
+    index = {
+        name: {'rms': rms, 'peak': peak, 'gain': gain_map[name]}
+        for name, (rms, peak) in levels.items()
+    }
+    os.makedirs(os.path.dirname(_INDEX_PATH) or '.', exist_ok=True)
+    with open(_INDEX_PATH, 'w') as f:
+        json.dump(index, f, indent=1, sort_keys=True)
+    return index
+
+
+def load_gains():
+    '''
+    Return {file name: gain} from the sample index, empty if there is none.
+    '''
+    try:
+        with open(_INDEX_PATH) as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return {name: entry['gain'] for name, entry in index.items()}
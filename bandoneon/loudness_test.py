@@ -0,0 +1,30 @@
+import unittest
+
+from . import loudness
+
+
+class TestGains(unittest.TestCase):
+
+    def test_loud_samples_are_attenuated(self):
+        levels = {
+            'quiet.wav': (0.1, 0.3),
+            'loud.wav': (0.4, 0.9),
+        }
+        got = loudness.gains(levels)
+        self.assertEqual(got['quiet.wav'], 1.0)
+        # the 10th percentile RMS between the two is 0.13
+        self.assertAlmostEqual(got['loud.wav'], 0.13 / 0.4)
+
+    def test_never_clips_or_amplifies(self):
+        levels = {
+            'a.wav': (0.5, 1.0),
+            'b.wav': (0.5, 1.0),
+            'spiky.wav': (0.5, 2.0),
+        }
+        got = loudness.gains(levels)
+        self.assertEqual(got['a.wav'], 1.0)
+        self.assertEqual(got['spiky.wav'], 0.5)
+
+    def test_silence(self):
+        self.assertEqual(loudness.gains({'s.wav': (0.0, 0.0)}),
+                         {'s.wav': 1.0})
@@ -27,7 +27,10 @@ class BellowsMessage():
             raise InvalidMessage(f'{raw} failed to match BellowMessage format')
         if not m.group(1):
             return None
-        self.pressure = int(m.group(1))
+        try:
+            self.pressure = int(m.group(1))
+        except ValueError:
+            raise InvalidMessage(f'{raw} has an invalid pressure')
         return self
 
     def __eq__(self, other):
@@ -54,7 +57,10 @@ class ButtonMessage():
         if not m.group(1):
             self.active_buttons = []
         else:
-            self.active_buttons = [int(i) for i in m.group(1).split(',')]
+            try:
+                self.active_buttons = [int(i) for i in m.group(1).split(',')]
+            except ValueError:
+                raise InvalidMessage(f'{raw} has an invalid button list')
         return self
 
     def __eq__(self, other):
@@ -65,8 +71,13 @@ def parse_message(raw_msg):
     '''
     Given a string either of <ButtonMessage> or <BellowsMessage> format, return
     a tuple (<ButtonMessage>|None, <BellowsMessage>|None)
+
+    Raises <InvalidMessage> for malformed messages.
     '''
-    str_msg = raw_msg.decode('utf-8')
+    try:
+        str_msg = raw_msg.decode('utf-8')
+    except UnicodeDecodeError:
+        raise InvalidMessage(f'{raw_msg!r} is not utf-8')
 
     if str_msg.startswith('blw'):
         return (None, BellowsMessage().parse(str_msg))
@@ -56,3 +56,8 @@ class TestParseMessage(unittest.TestCase):
         for m, ex in expected.items():
             got = message.parse_message(m)
             self.assertEqual(ex, got)
+
+    def test_malformed_messages(self):
+        for m in [b'\xff\xfe', b'btn:1,,2', b'btn:,', b'blw:-', b'blw:5-5']:
+            with self.assertRaises(message.InvalidMessage):
+                message.parse_message(m)
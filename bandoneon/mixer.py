@@ -0,0 +1,222 @@
+'''
+Mixer setup, buffer-size calibration and runtime glitch telemetry.
+
+pygame does not expose the SDL audio callback, so glitches are measured
+indirectly: a known-length clip is played on a reserved channel and its
+wall-clock duration is compared against its nominal duration. Any time the
+mixer fails to deliver a buffer in time, playback falls behind and the clip
+takes longer than it should.
+
+The clip's end is only seen by polling, so a probe thread that wakes up late
+would look like a late clip. The probe takes the clip to have ended at most
+one poll period after it was last seen playing, which leaves at most one
+poll period of scheduling delay in the drift.
+
+Overruns of the audio callback cannot be observed through pygame at all; the
+only overflow counted is a voice finding no free channel.
+'''
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+import pygame
+
+from . import samples
+
+
+FREQUENCY = 44100
+SIZE = -16
+CHANNELS = 2
+DEFAULT_BUFFER = 512
+NUM_VOICES = 16
+
+# Largest to smallest, calibration stops at the first size that glitches
+CANDIDATE_BUFFERS = [4096, 2048, 1024, 512, 256, 128]
+
+_CONFIG_PATH = os.getenv('BANDONEON_MIXER_CONFIG', 'mixer.json')
+_PROBE_SECONDS = 1.0
+# Drift tolerated before a probe period counts as a glitch, in buffers
+_DRIFT_BUFFERS = 2
+
+
+class MixerStats():
+    '''
+    Runtime counters for the mixer.
+
+    underruns - probe periods where playback fell behind wall-clock time
+    voice_overflows - voices that could not be started because every channel
+                      was busy, not audio callback overruns, which pygame
+                      does not expose
+    '''
+
+    def __init__(self):
+        self.underruns = 0
+        self.voice_overflows = 0
+        self.probes = 0
+        self.max_drift = 0.0
+
+    def str(self):
+        return (
+            f'underruns:{self.underruns} '
+            f'voice_overflows:{self.voice_overflows} '
+            f'probes:{self.probes} max_drift:{self.max_drift * 1000:.1f}ms'
+        )
+
+
+stats = MixerStats()
+
+_buffer = None
+# The frequency SDL actually opened the device at, which may differ
+_frequency = None
+_monitor = None
+
+
+def load_buffer_size():
+    '''
+    Return the calibrated buffer size, or the default if none was persisted.
+    '''
+    try:
+        with open(_CONFIG_PATH) as f:
+            return int(json.load(f)['buffer'])
+    except (OSError, ValueError, KeyError):
+        return DEFAULT_BUFFER
+
+
+def save_buffer_size(buffer):
+    with open(_CONFIG_PATH, 'w') as f:
+        json.dump({'buffer': buffer}, f)
+
+
+def init_mixer(buffer=None, monitor=True):
+    '''
+    (Re)initialize the mixer with the given, or persisted, buffer size and
+    optionally start the underrun monitor on the reserved channel.
+    '''
+    global _buffer, _frequency, _monitor
+    if buffer is None:
+        buffer = load_buffer_size()
+    _stop_monitor()
+    pygame.mixer.quit()
+    pygame.mixer.init(frequency=FREQUENCY, size=SIZE, channels=CHANNELS,
+                      buffer=buffer)
+    # one extra channel, reserved for the probe
+    pygame.mixer.set_num_channels(NUM_VOICES + 1)
+    pygame.mixer.set_reserved(1)
+    _buffer = buffer
+    _frequency = pygame.mixer.get_init()[0]
+    if monitor:
+        _monitor = _UnderrunMonitor(buffer)
+        _monitor.start()
+
+
+def _stop_monitor():
+    global _monitor
+    if _monitor:
+        _monitor.stop()
+        _monitor = None
+
+
+# the monitor must not touch the mixer once pygame starts shutting it down
+atexit.register(_stop_monitor)
+
+
+def buffer_seconds(buffer=None):
+    return (buffer or _buffer) / (_frequency or FREQUENCY)
+
+
+def _tone(frequency, seconds, amplitude=0.0):
+    '''
+    Build a <pygame.mixer.Sound> holding a sine tone, in the format the mixer
+    was opened with so that it plays for exactly seconds.
+    '''
+    rate, size, channels = pygame.mixer.get_init()
+    t = np.arange(int(rate * seconds)) / rate
+    mono = amplitude * np.sin(2 * np.pi * frequency * t, dtype=np.float32)
+    return pygame.mixer.Sound(
+        buffer=samples.to_pcm(mono[:, None], size, channels))
+
+
+def _playback_drift(channel, clip, nominal, poll, stopped=None):
+    '''
+    Play clip on channel and return how far behind nominal it finished.
+    Polling that wakes up more than poll late is not counted as drift.
+    '''
+    start = time.perf_counter()
+    channel.play(clip)
+    last_busy = start
+    while True:
+        now = time.perf_counter()
+        if not channel.get_busy():
+            break
+        last_busy = now
+        if stopped and stopped.is_set():
+            break
+        time.sleep(poll)
+    return min(now, last_busy + poll) - start - nominal
+
+
+class _UnderrunMonitor(threading.Thread):
+
+    def __init__(self, buffer):
+        super().__init__(daemon=True)
+        self._buffer = buffer
+        self._stopped = threading.Event()
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+    def run(self):
+        channel = pygame.mixer.Channel(0)
+        clip = _tone(0, _PROBE_SECONDS)
+        period = buffer_seconds(self._buffer)
+        while not self._stopped.is_set():
+            drift = _playback_drift(channel, clip, _PROBE_SECONDS, period,
+                                    self._stopped)
+            if self._stopped.is_set():
+                break
+            stats.probes += 1
+            stats.max_drift = max(stats.max_drift, drift)
+            # drift still holds up to one period of this thread's own
+            # scheduling delay on top of any real playback delay
+            if drift > _DRIFT_BUFFERS * period:
+                stats.underruns += 1
+                logging.warning(f'Mixer underrun: {drift * 1000:.1f}ms late')
+
+
+def calibrate(seconds=2.0, persist=True):
+    '''
+    Try progressively smaller buffer sizes while every voice plays a tone,
+    and keep the smallest one that finishes on time.
+    '''
+    chosen = None
+    for buffer in CANDIDATE_BUFFERS:
+        init_mixer(buffer, monitor=False)
+        period = buffer_seconds(buffer)
+        probe = _tone(0, seconds)
+        voices = [_tone(110 * (i + 1), 0.5, 0.5 / NUM_VOICES)
+                  for i in range(NUM_VOICES)]
+        for voice in voices:
+            voice.play(loops=-1)
+        drift = _playback_drift(pygame.mixer.Channel(0), probe, seconds,
+                                period / 4)
+        pygame.mixer.stop()
+        ok = drift <= _DRIFT_BUFFERS * period
+        logging.info(f'{pygame.mixer.get_init()} buffer {buffer}: '
+                     f'drift {drift * 1000:.1f}ms '
+                     f'{"ok" if ok else "glitched"}')
+        if not ok:
+            break
+        chosen = buffer
+
+    if chosen is None:
+        chosen = CANDIDATE_BUFFERS[0]
+        logging.warning(f'No buffer size was glitch-free, using {chosen}')
+    if persist:
+        save_buffer_size(chosen)
+    init_mixer(chosen)
+    return chosen
@@ -0,0 +1,108 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from . import mixer
+
+
+class _Clock():
+    '''
+    A fake time module whose sleeps advance the clock, oversleeping by late
+    once the clock passes late_after.
+    '''
+
+    def __init__(self, late_after=None, late=0.0):
+        self.now = 0.0
+        self.late_after = late_after
+        self.late = late
+
+    def perf_counter(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+        if self.late_after is not None and self.now >= self.late_after:
+            self.now += self.late
+            self.late_after = None
+
+
+class _Channel():
+
+    def __init__(self, clock, seconds):
+        self.clock = clock
+        self.seconds = seconds
+        self.end = None
+
+    def play(self, clip):
+        self.end = self.clock.now + self.seconds
+
+    def get_busy(self):
+        return self.clock.now < self.end
+
+
+class TestPlaybackDrift(unittest.TestCase):
+
+    def _drift(self, clock, seconds, nominal=1.0, poll=0.01):
+        with mock.patch.object(mixer, 'time', clock):
+            return mixer._playback_drift(_Channel(clock, seconds), None,
+                                         nominal, poll)
+
+    def test_on_time(self):
+        self.assertAlmostEqual(self._drift(_Clock(), 1.0), 0.0, places=6)
+
+    def test_late_playback_counts(self):
+        self.assertAlmostEqual(self._drift(_Clock(), 1.1), 0.1, places=2)
+
+    def test_late_wake_up_does_not_count(self):
+        # the last poll before the clip ends oversleeps by half a second
+        clock = _Clock(late_after=0.995, late=0.5)
+        self.assertLessEqual(self._drift(clock, 1.0), 0.01)
+
+
+class TestBufferSize(unittest.TestCase):
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix='.json')
+        os.close(fd)
+        self.addCleanup(os.remove, self.path)
+        patcher = mock.patch.object(mixer, '_CONFIG_PATH', self.path)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_round_trip(self):
+        mixer.save_buffer_size(256)
+        self.assertEqual(mixer.load_buffer_size(), 256)
+
+    def test_corrupt_file_falls_back(self):
+        with open(self.path, 'w') as f:
+            f.write('{"buf')
+        self.assertEqual(mixer.load_buffer_size(), mixer.DEFAULT_BUFFER)
+
+    def test_missing_file_falls_back(self):
+        with mock.patch.object(mixer, '_CONFIG_PATH', self.path + '.missing'):
+            self.assertEqual(mixer.load_buffer_size(), mixer.DEFAULT_BUFFER)
+
+
+class TestCalibrate(unittest.TestCase):
+
+    def _calibrate(self, drifts):
+        with mock.patch.object(mixer, 'pygame'), \
+                mock.patch.object(mixer, '_tone'), \
+                mock.patch.object(mixer, 'init_mixer') as init_mixer, \
+                mock.patch.object(mixer, 'save_buffer_size') as save, \
+                mock.patch.object(mixer, '_playback_drift',
+                                  side_effect=drifts), \
+                self.assertLogs(level='INFO'):
+            chosen = mixer.calibrate()
+        init_mixer.assert_called_with(chosen)
+        save.assert_called_once_with(chosen)
+        return chosen
+
+    def test_keeps_smallest_buffer_before_a_glitch(self):
+        # on time down to 512 frames, then 50ms behind at 256
+        self.assertEqual(self._calibrate([0.0, 0.0, 0.001, 0.002, 0.05]), 512)
+
+    def test_falls_back_to_largest_when_all_glitch(self):
+        self.assertEqual(self._calibrate([0.5]),
+                         mixer.CANDIDATE_BUFFERS[0])
@@ -0,0 +1,267 @@
+'''
+Pipelined variant of the main loop, enabled with BANDONEON_PIPELINE=1.
+
+The sequential loop parses, loads and plays in one thread, so a slow sample
+load delays every later event. Here the work is split into stages:
+
+- input (the calling thread): parses messages, drops ones that do not change
+  the button or bellows state, and hands the rest to the control stage
+  through a bounded queue
+- loader (a thread pool): fetches or decodes samples
+- control (a high priority thread): starts and stops voices and sets their
+  volume, starting a voice only once its sample has been loaded
+
+A slow load therefore never holds up a bellows volume change.
+'''
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import os
+import queue
+import threading
+import time
+
+from . import bellows, button, profiler
+from .message import InvalidMessage, parse_message
+from .sound import get_sound
+
+
+# Input messages the control stage may fall behind by before input blocks
+_QUEUE_SIZE = 32
+_LOADERS = int(os.getenv('BANDONEON_LOADERS', '2'))
+_RT_PRIORITY = 50
+# Seconds between checks that the control stage is alive while input waits
+_CONTROL_CHECK = 0.1
+
+_BUTTONS = 'buttons'
+_PRESSURE = 'pressure'
+_LOADED = 'loaded'
+
+
+class PipelineStats():
+
+    def __init__(self):
+        self.input_blocked = 0
+        self.input_blocked_seconds = 0.0
+        self.max_queue_depth = 0
+        self.loads = 0
+        self.max_loads_in_flight = 0
+        self.max_load_seconds = 0.0
+        self.stale_loads = 0
+
+    def str(self):
+        return (
+            f'input blocked {self.input_blocked} times '
+            f'({self.input_blocked_seconds:.3f}s), '
+            f'max queue depth {self.max_queue_depth}/{_QUEUE_SIZE}, '
+            f'{self.loads} loads, max {self.max_loads_in_flight} in flight, '
+            f'slowest {self.max_load_seconds * 1000:.1f}ms, '
+            f'{self.stale_loads} stale'
+        )
+
+
+stats = PipelineStats()
+
+
+def _load(bttn, pressure, sound_class):
+    '''
+    Loader stage job, returns the <Sound> or None when there is no sample or
+    it failed to load. Errors are logged here, as an exception escaping the
+    job would never reach the control stage and the button would stay loading.
+    '''
+    start = time.perf_counter()
+    try:
+        sound = get_sound(bttn.get_file(pressure), sound_class)
+    except IndexError:
+        sound = None
+    except Exception as e:
+        logging.error(f'Failed to load a sample for {bttn}: {e}')
+        sound = None
+    return sound, time.perf_counter() - start
+
+
+class _ControlStage(threading.Thread):
+
+    def __init__(self, sound_class):
+        super().__init__(daemon=True)
+        self.inbox = queue.Queue()
+        self.input_slots = threading.Semaphore(_QUEUE_SIZE)
+        self._sound_class = sound_class
+        self._loader = ThreadPoolExecutor(_LOADERS)
+        # the exception the stage died of, re-raised by the input stage
+        self.error = None
+
+        self._pressed = set()
+        self._pressure = 0
+        self._mode = bellows.OPEN
+        self._volume = 0
+        # <Button> to <Sound>, for the voices playing
+        self._active = {}
+        # <Button> to the bellows mode its sample is being loaded for
+        self._loading = {}
+
+    def run(self):
+        try:
+            os.sched_setscheduler(0, os.SCHED_FIFO,
+                                  os.sched_param(_RT_PRIORITY))
+        except (AttributeError, OSError) as e:
+            logging.info(f'Control stage runs without real-time priority: {e}')
+
+        try:
+            running = True
+            while running:
+                items = [self.inbox.get()]
+                while True:
+                    try:
+                        items.append(self.inbox.get_nowait())
+                    except queue.Empty:
+                        break
+                stats.max_queue_depth = max(stats.max_queue_depth, len(items))
+                running = self._handle(items)
+                profiler.stats.active_voices = len(self._active)
+
+            for sound in self._active.values():
+                sound.stop()
+        except Exception as e:
+            logging.error(f'Control stage failed: {e!r}')
+            self.error = e
+        finally:
+            self._loader.shutdown(wait=True)
+
+    def _handle(self, items):
+        '''
+        Apply a batch of inbox items, coalescing input to its final state.
+        Returns False once the input has ended.
+        '''
+        pressed = pressure = None
+        running = True
+        for item in items:
+            if item is None:
+                running = False
+                continue
+            kind, value = item[0], item[1:]
+            if kind == _LOADED:
+                self._loaded(*value)
+                continue
+            self.input_slots.release()
+            if kind == _BUTTONS:
+                pressed = value[0]
+            else:
+                pressure = value[0]
+
+        if pressure is not None:
+            self._set_pressure(pressure)
+        if pressed is not None:
+            self._set_buttons(pressed)
+        return running
+
+    def _set_pressure(self, pressure):
+        mode = bellows.pressure_to_mode(pressure)
+        self._volume = bellows.pressure_to_volume(pressure)
+        self._pressure = pressure
+        if mode != self._mode:
+            self._mode = mode
+            for sound in self._active.values():
+                sound.stop()
+            self._active = {}
+            for bttn in self._pressed:
+                self._request(bttn)
+        else:
+            for sound in self._active.values():
+                sound.set_volume(self._volume)
+
+    def _set_buttons(self, pressed):
+        for bttn in self._pressed - pressed:
+            if bttn in self._active:
+                self._active.pop(bttn).stop()
+        for bttn in pressed - self._pressed:
+            self._request(bttn)
+        self._pressed = pressed
+
+    def _request(self, bttn):
+        if self._loading.get(bttn) == self._mode:
+            return
+        self._loading[bttn] = self._mode
+        stats.loads += 1
+        stats.max_loads_in_flight = max(stats.max_loads_in_flight,
+                                        len(self._loading))
+        future = self._loader.submit(_load, bttn, self._pressure,
+                                     self._sound_class)
+        mode = self._mode
+        future.add_done_callback(
+            lambda f: self.inbox.put((_LOADED, bttn, mode, *f.result())))
+
+    def _loaded(self, bttn, mode, sound, seconds):
+        stats.max_load_seconds = max(stats.max_load_seconds, seconds)
+        if self._loading.get(bttn) == mode:
+            del self._loading[bttn]
+        if (sound is None or mode != self._mode or bttn not in self._pressed
+                or bttn in self._active):
+            if sound is not None:
+                stats.stale_loads += 1
+            return
+        self._active[bttn] = sound
+        sound.set_volume(self._volume)
+        sound.play(loops=-1)  # ignore the returned channel
+
+
+def _acquire_slot(control):
+    '''
+    Take an input slot, waiting while the control stage is behind. Returns
+    False once the control stage has died.
+    '''
+    if control.error:
+        return False
+    if control.input_slots.acquire(blocking=False):
+        return True
+    stats.input_blocked += 1
+    blocked = time.perf_counter()
+    while not control.input_slots.acquire(timeout=_CONTROL_CHECK):
+        if not control.is_alive():
+            return False
+    stats.input_blocked_seconds += time.perf_counter() - blocked
+    return True
+
+
+def run(source, sound_class):
+    '''
+    Run the pipeline until source is exhausted, the calling thread being the
+    input stage. An exception that stops the control stage is raised here.
+    '''
+    control = _ControlStage(sound_class)
+    control.start()
+
+    pressed = None
+    pressure = None
+    for msg in source:
+        profiler.stats.iterations += 1
+        start = time.perf_counter()
+        try:
+            bttn_msg, bellow_msg = parse_message(msg)
+        except InvalidMessage as e:
+            profiler.stats.invalid += 1
+            logging.warning(f'Ignoring message: {e}')
+            continue
+        finally:
+            profiler.stats.parse_seconds += time.perf_counter() - start
+
+        item = None
+        if bttn_msg:
+            current = button.get_current_buttons_pushed(bttn_msg)
+            if current != pressed:
+                pressed = current
+                item = (_BUTTONS, current)
+        if bellow_msg and bellow_msg.pressure != pressure:
+            pressure = bellow_msg.pressure
+            item = (_PRESSURE, pressure)
+        if item is None:
+            continue
+
+        if not _acquire_slot(control):
+            break
+        control.inbox.put(item)
+
+    control.inbox.put(None)
+    control.join()
+    logging.info(f'Pipeline: {stats.str()}')
+    if control.error:
+        raise control.error
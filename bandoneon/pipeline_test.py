@@ -0,0 +1,132 @@
+import threading
+import time
+import unittest
+from unittest import mock
+
+from . import button, pipeline
+from .sound import SoundABC
+
+
+class _Button():
+
+    def __init__(self, name):
+        self.name = name
+
+    def get_file(self, bellows_value):
+        return f'pipeline_test/{self.name}/{bellows_value >= 0}'
+
+
+class _RecordingSound(SoundABC):
+    '''
+    Records calls, taking a while to load samples named slow and failing the
+    first load of samples named broken.
+    '''
+    failed = set()
+
+    def __init__(self, file_path):
+        if 'slow' in file_path:
+            time.sleep(0.5)
+        if 'broken' in file_path and file_path not in self.failed:
+            self.failed.add(file_path)
+            raise OSError(f'cannot decode {file_path}')
+        self.file_path = file_path
+        self.volume = None
+        self.playing = threading.Event()
+
+    def play(self, loops=-1):
+        self.playing.set()
+
+    def stop(self):
+        self.playing.clear()
+
+    def set_volume(self, volume):
+        self.volume = volume
+
+
+class _FailingSound(_RecordingSound):
+
+    def play(self, loops=-1):
+        raise RuntimeError('no audio device')
+
+
+def _wait_for(predicate, timeout=2.0):
+    end = time.perf_counter() + timeout
+    while not predicate():
+        if time.perf_counter() > end:
+            return False
+        time.sleep(0.001)
+    return True
+
+
+class TestControlStage(unittest.TestCase):
+
+    def setUp(self):
+        self.control = pipeline._ControlStage(_RecordingSound)
+        self.control.start()
+
+    def tearDown(self):
+        self.control.inbox.put(None)
+        self.control.join()
+
+    def _send(self, *item):
+        self.control.inbox.put(item)
+
+    def test_slow_load_does_not_block_volume(self):
+        fast, slow = _Button('fast'), _Button('slow')
+        self._send(pipeline._PRESSURE, 127)
+        self._send(pipeline._BUTTONS, {fast})
+        self.assertTrue(_wait_for(lambda: fast in self.control._active))
+        fast_sound = self.control._active[fast]
+
+        self._send(pipeline._BUTTONS, {fast, slow})
+        self._send(pipeline._PRESSURE, 64)
+        self.assertTrue(_wait_for(lambda: fast_sound.volume == 64 / 127,
+                                  timeout=0.2))
+        self.assertNotIn(slow, self.control._active)
+
+        self.assertTrue(_wait_for(lambda: slow in self.control._active))
+        self.assertEqual(self.control._active[slow].volume, 64 / 127)
+
+    def test_released_before_loaded_never_plays(self):
+        slow = _Button('slow-released')
+        self._send(pipeline._BUTTONS, {slow})
+        self._send(pipeline._BUTTONS, set())
+        self.assertTrue(_wait_for(lambda: not self.control._loading))
+        self.assertNotIn(slow, self.control._active)
+
+    def test_failed_load_does_not_stop_later_presses(self):
+        broken = _Button('broken')
+        with self.assertLogs(level='ERROR'):
+            self._send(pipeline._BUTTONS, {broken})
+            self.assertTrue(_wait_for(lambda: _RecordingSound.failed
+                                      and not self.control._loading))
+        self.assertNotIn(broken, self.control._active)
+
+        self._send(pipeline._BUTTONS, set())
+        self.assertTrue(_wait_for(lambda: not self.control._pressed))
+        self._send(pipeline._BUTTONS, {broken})
+        self.assertTrue(_wait_for(lambda: broken in self.control._active))
+        self.assertTrue(self.control._active[broken].playing.is_set())
+
+
+class TestRun(unittest.TestCase):
+
+    def test_control_failure_is_raised_by_input(self):
+        bttn = _Button('failing-play')
+        source = [b'btn:1'] + [f'blw:{i % 100 + 1}'.encode()
+                               for i in range(200)]
+        errors = []
+
+        def run():
+            try:
+                pipeline.run(iter(source), _FailingSound)
+            except RuntimeError as e:
+                errors.append(e)
+
+        with mock.patch.object(button, '_buttons', {1: bttn}), \
+                self.assertLogs(level='ERROR'):
+            thread = threading.Thread(target=run, daemon=True)
+            thread.start()
+            thread.join(5)
+        self.assertFalse(thread.is_alive())
+        self.assertEqual([str(e) for e in errors], ['no audio device'])
@@ -0,0 +1,142 @@
+'''
+Low overhead runtime counters and a sampling profiler for the main loop.
+
+The counters are always kept, and sending SIGUSR1 to the process logs them.
+The profiler is opt-in: when BANDONEON_PROFILE names an output path, a
+background thread samples the main thread's stack every
+BANDONEON_PROFILE_INTERVAL seconds and aggregates the samples in the
+collapsed stack format read by flamegraph.pl and speedscope. SIGUSR1 then
+also writes the collapsed stacks so far.
+'''
+from collections import Counter
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+
+from . import mixer
+
+
+PROFILE_PATH = os.getenv('BANDONEON_PROFILE')
+_INTERVAL = float(os.getenv('BANDONEON_PROFILE_INTERVAL', '0.01'))
+
+
+class Stats():
+    '''
+    Counters for the main loop, cheap enough to update on every message.
+    '''
+
+    def __init__(self):
+        self.iterations = 0
+        self.invalid = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.active_voices = 0
+        self.parse_seconds = 0.0
+        self.load_seconds = 0.0
+        # the iterations and time at the previous report
+        self._reported_iterations = 0
+        self._reported = time.perf_counter()
+
+    def rate(self):
+        '''
+        Iterations per second since the previous call, or since creation.
+        '''
+        now = time.perf_counter()
+        rate = ((self.iterations - self._reported_iterations)
+                / max(now - self._reported, 1e-9))
+        self._reported_iterations = self.iterations
+        self._reported = now
+        return rate
+
+    def str(self):
+        '''
+        Describe the counters, the iteration rate being the rate since the
+        previous report rather than over the process lifetime.
+        '''
+        lookups = self.cache_hits + self.cache_misses
+        hit_rate = 100 * self.cache_hits / lookups if lookups else 0.0
+        return (
+            f'{self.iterations} iterations, {self.rate():.1f}/s since the '
+            f'last report, '
+            f'{self.invalid} invalid messages, '
+            f'cache hit rate {hit_rate:.1f}% of {lookups}, '
+            f'{self.active_voices} active voices, '
+            f'parsing {self.parse_seconds:.3f}s, '
+            f'loading {self.load_seconds:.3f}s'
+        )
+
+
+stats = Stats()
+
+
+def _collapse(frame):
+    stack = []
+    while frame is not None:
+        code = frame.f_code
+        stack.append(f'{os.path.basename(code.co_filename)}:{code.co_name}')
+        frame = frame.f_back
+    return ';'.join(reversed(stack))
+
+
+class SamplingProfiler(threading.Thread):
+    '''
+    Periodically samples the stack of the thread that created it.
+    '''
+
+    def __init__(self, path, interval=_INTERVAL):
+        super().__init__(daemon=True)
+        self.path = path
+        self.interval = interval
+        self.samples = Counter()
+        self._lock = threading.Lock()
+        self._thread_id = threading.get_ident()
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self._thread_id)
+            if frame is None:
+                continue
+            stack = _collapse(frame)
+            with self._lock:
+                self.samples[stack] += 1
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+        self.write()
+
+    def write(self):
+        with self._lock:
+            samples = self.samples.most_common()
+        with open(self.path, 'w') as f:
+            for stack, count in samples:
+                f.write(f'{stack} {count}\n')
+        logging.info(f'Wrote {sum(c for _, c in samples)} stack samples '
+                     f'to {self.path}')
+
+
+def start(path=PROFILE_PATH):
+    '''
+    Dump the counters on SIGUSR1 and, if path is given, start profiling the
+    calling thread. Returns the <SamplingProfiler>, or None when profiling is
+    not enabled.
+    '''
+    profiler = None
+    if path:
+        profiler = SamplingProfiler(path)
+        profiler.start()
+
+    def dump(signum, frame):
+        logging.warning(f'Loop: {stats.str()}')
+        logging.warning(f'Mixer: {mixer.stats.str()}')
+        if profiler:
+            profiler.write()
+
+    # signal handlers can only be installed from the main thread
+    if threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGUSR1, dump)
+    return profiler
@@ -0,0 +1,51 @@
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from . import profiler
+
+
+def _busy_leaf(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+class TestSamplingProfiler(unittest.TestCase):
+
+    def test_collapsed_stacks(self):
+        fd, path = tempfile.mkstemp()
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+
+        sampler = profiler.SamplingProfiler(path, interval=0.001)
+        sampler.start()
+        _busy_leaf(0.1)
+        sampler.stop()
+
+        with open(path) as f:
+            lines = f.read().splitlines()
+        self.assertTrue(lines)
+        stack, count = lines[0].rsplit(' ', 1)
+        self.assertGreater(int(count), 0)
+        self.assertTrue(stack.endswith('profiler_test.py:_busy_leaf'))
+
+
+class TestStats(unittest.TestCase):
+
+    def test_str(self):
+        stats = profiler.Stats()
+        stats.cache_hits = 3
+        stats.cache_misses = 1
+        self.assertIn('cache hit rate 75.0% of 4', stats.str())
+
+    def test_rate_is_since_the_last_report(self):
+        stats = profiler.Stats()
+        stats.iterations = 1000
+        stats.rate()
+        stats.iterations = 1010
+        with mock.patch.object(profiler.time, 'perf_counter',
+                               return_value=stats._reported + 2.0):
+            self.assertAlmostEqual(stats.rate(), 5.0)
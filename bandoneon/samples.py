@@ -0,0 +1,264 @@
+'''
+Sample decoding, resampling, pitch shifting and the preconverted PCM cache.
+
+Decoding a wave file and converting it to the mixer's format is the slow part
+of loading a sound. The preconvert step does that work once, in a process
+pool, and writes raw PCM in the mixer's native format to the cache directory;
+<sound.Sound> then loads from the cache with a single read.
+'''
+from concurrent.futures import ProcessPoolExecutor
+import logging
+import multiprocessing
+import os
+import tempfile
+import time
+import wave
+
+import numpy as np
+
+
+_CACHE_DIR = os.getenv('BANDONEON_CACHE_DIR', 'sounds/cache')
+
+# Half the width of the windowed-sinc resampling kernel, in input samples
+_HALF_TAPS = 16
+# Output frames resampled per vectorized step, bounds the kernel matrix size
+_CHUNK = 8192
+
+# pygame mixer size to numpy dtype and full-scale value
+_FORMATS = {
+    8: (np.uint8, 127),
+    -8: (np.int8, 127),
+    16: (np.uint16, 32767),
+    -16: (np.int16, 32767),
+    -32: (np.int32, 2147483647),
+    32: (np.float32, 1),
+}
+
+
+# Pools spawn their workers, forking could copy a running mixer and its threads
+_POOL_CONTEXT = multiprocessing.get_context('spawn')
+
+
+class UnsupportedFormat(Exception):
+    pass
+
+
+# What reading a file pygame may still load can fail with, eg. the wave module
+# rejects WAVE_FORMAT_EXTENSIBLE and float files
+DECODE_ERRORS = (wave.Error, UnsupportedFormat, EOFError, OSError)
+
+
+def read_wav(file_path):
+    '''
+    Return (frame rate, <np.ndarray>) for a PCM wave file, the array being
+    float32 frames x channels in the -1.0, 1.0 range.
+    '''
+    with wave.open(file_path, 'rb') as w:
+        rate = w.getframerate()
+        channels = w.getnchannels()
+        width = w.getsampwidth()
+        raw = w.readframes(w.getnframes())
+
+    if width == 1:
+        data = (np.frombuffer(raw, np.uint8).astype(np.float32) - 128) / 128
+    elif width == 2:
+        data = np.frombuffer(raw, '<i2').astype(np.float32) / 2 ** 15
+    elif width == 3:
+        b = np.frombuffer(raw, np.uint8).reshape(-1, 3).astype(np.int32)
+        ints = b[:, 0] | (b[:, 1] << 8) | (b[:, 2] << 16)
+        ints = np.where(ints & 0x800000, ints - (1 << 24), ints)
+        data = ints.astype(np.float32) / 2 ** 23
+    elif width == 4:
+        data = np.frombuffer(raw, '<i4').astype(np.float32) / 2 ** 31
+    else:
+        raise UnsupportedFormat(f'{file_path}: {width} byte samples')
+    return rate, data.reshape(-1, channels)
+
+
+def resample(data, ratio):
+    '''
+    Band-limited resampling of a frames x channels array, reading ratio input
+    frames per output frame (ratio > 1 shortens and raises the pitch).
+    '''
+    n_in = data.shape[0]
+    n_out = int(n_in / ratio)
+    # low-pass below the new Nyquist frequency when decimating
+    cutoff = min(1.0, 1.0 / ratio)
+    taps = np.arange(-_HALF_TAPS + 1, _HALF_TAPS + 1)
+    padded = np.pad(data, ((_HALF_TAPS, _HALF_TAPS + 1), (0, 0)))
+    out = np.empty((n_out, data.shape[1]), dtype=np.float32)
+
+    for start in range(0, n_out, _CHUNK):
+        pos = np.arange(start, min(start + _CHUNK, n_out)) * ratio
+        base = np.floor(pos).astype(np.int64)
+        x = (pos - base)[:, None] - taps[None, :]
+        window = 0.5 * (1 + np.cos(np.pi * x / _HALF_TAPS))
+        kernel = cutoff * np.sinc(cutoff * x) * window
+        kernel /= kernel.sum(axis=1, keepdims=True)
+        frames = padded[base[:, None] + taps[None, :] + _HALF_TAPS]
+        out[start:start + len(pos)] = np.einsum('mk,mkc->mc', kernel, frames)
+    return out
+
+
+def pitch_shift(data, semitones):
+    '''
+    Shift a frames x channels array by semitones, changing its length.
+    '''
+    return resample(data, 2 ** (semitones / 12))
+
+
+def write_wav(file_path, rate, data):
+    '''
+    Write a float frames x channels array as a 16bit PCM wave file, replacing
+    any existing file atomically.
+    '''
+    # a unique temp file, as several processes may synthesize the same note
+    fd, tmp_path = tempfile.mkstemp(
+        suffix='.tmp', dir=os.path.dirname(file_path) or '.')
+    try:
+        with os.fdopen(fd, 'wb') as f, wave.open(f, 'wb') as w:
+            w.setnchannels(data.shape[1])
+            w.setsampwidth(2)
+            w.setframerate(rate)
+            w.writeframes(to_pcm(data, -16, data.shape[1]))
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def synthesize(source_path, semitones, file_path):
+    '''
+    Write a copy of the sample at source_path shifted by semitones to
+    file_path, unless it was already synthesized.
+    '''
+    if os.path.exists(file_path):
+        return file_path
+    rate, data = read_wav(source_path)
+    os.makedirs(os.path.dirname(file_path) or '.', exist_ok=True)
+    write_wav(file_path, rate, pitch_shift(data, semitones))
+    logging.debug(f'Synthesized {file_path} from {source_path} '
+                  f'({semitones:+d} semitones)')
+    return file_path
+
+
+def _synthesize(args):
+    try:
+        return synthesize(*args)
+    except DECODE_ERRORS as e:
+        # logged by the parent, a worker's log may go nowhere
+        return e
+
+
+def synthesize_all(jobs, workers=None):
+    '''
+    Run (source path, semitones, file path) <synthesize> jobs in a process
+    pool, returning the file path of each job, or None for those whose source
+    could not be decoded.
+    '''
+    if all(os.path.exists(file_path) for _, _, file_path in jobs):
+        return [file_path for _, _, file_path in jobs]
+    with ProcessPoolExecutor(workers, mp_context=_POOL_CONTEXT) as pool:
+        results = list(pool.map(_synthesize, jobs))
+    paths = []
+    for (source_path, _, file_path), result in zip(jobs, results):
+        if isinstance(result, Exception):
+            logging.warning(f'Cannot synthesize {file_path} from '
+                            f'{source_path}: {result!r}')
+            result = None
+        paths.append(result)
+    return paths
+
+
+def to_pcm(data, size, channels):
+    '''
+    Convert a float frames x channels array to raw PCM bytes in the given
+    pygame mixer size and channel count.
+    '''
+    if size not in _FORMATS:
+        raise UnsupportedFormat(f'mixer size {size}')
+    if data.shape[1] != channels:
+        mono = data.mean(axis=1, keepdims=True)
+        data = np.repeat(mono, channels, axis=1)
+    dtype, scale = _FORMATS[size]
+    data = np.clip(data, -1.0, 1.0) * scale
+    if size in (8, 16):
+        data = data + scale + 1
+    return data.astype(dtype).tobytes()
+
+
+def cache_path(file_path, fmt):
+    '''
+    Location of the preconverted PCM for file_path in the mixer format fmt,
+    a (frequency, size, channels) tuple as given by pygame.mixer.get_init().
+    '''
+    frequency, size, channels = fmt
+    return os.path.join(_CACHE_DIR, f'{frequency}_{size}_{channels}',
+                        os.path.basename(file_path) + '.pcm')
+
+
+def load_cached(file_path, fmt):
+    '''
+    Return the preconverted PCM bytes for file_path, or None when there is no
+    up to date cache entry.
+    '''
+    path = cache_path(file_path, fmt)
+    try:
+        if os.path.getmtime(path) < os.path.getmtime(file_path):
+            return None
+        with open(path, 'rb') as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def convert(file_path, fmt):
+    '''
+    Decode, resample and cache one sample, returning the seconds spent in
+    each stage as (decode, resample, write).
+    '''
+    frequency, size, channels = fmt
+    t0 = time.perf_counter()
+    rate, data = read_wav(file_path)
+    t1 = time.perf_counter()
+    if rate != frequency:
+        data = resample(data, rate / frequency)
+    pcm = to_pcm(data, size, channels)
+    t2 = time.perf_counter()
+    path = cache_path(file_path, fmt)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(pcm)
+    t3 = time.perf_counter()
+    return t1 - t0, t2 - t1, t3 - t2
+
+
+def _convert(args):
+    try:
+        return convert(*args)
+    except DECODE_ERRORS as e:
+        return e
+
+
+def preconvert(file_paths, fmt, workers=None):
+    '''
+    Convert every file into the cache using a process pool. Returns the
+    per-stage seconds summed across workers as a dict, and the files that
+    could not be decoded, which are left for pygame to load directly.
+    '''
+    totals = {'decode': 0.0, 'resample': 0.0, 'write': 0.0}
+    skipped = []
+    jobs = [(path, fmt) for path in file_paths]
+    with ProcessPoolExecutor(workers, mp_context=_POOL_CONTEXT) as pool:
+        results = pool.map(_convert, jobs, chunksize=4)
+        for (path, _), result in zip(jobs, results):
+            if isinstance(result, Exception):
+                logging.warning(f'Not preconverting {path}: {result!r}')
+                skipped.append(path)
+                continue
+            decode, resample_, write = result
+            totals['decode'] += decode
+            totals['resample'] += resample_
+            totals['write'] += write
+    logging.debug(f'Preconverted {len(jobs) - len(skipped)} samples: {totals}')
+    return totals, skipped
@@ -0,0 +1,138 @@
+from concurrent.futures import ThreadPoolExecutor
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+import wave
+
+import numpy as np
+
+from . import samples
+
+
+def _write_wav(path, rate, channels, width, frames):
+    with wave.open(path, 'wb') as w:
+        w.setnchannels(channels)
+        w.setsampwidth(width)
+        w.setframerate(rate)
+        w.writeframes(frames)
+
+
+class TestReadWav(unittest.TestCase):
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix='.wav')
+        os.close(fd)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_16bit_stereo(self):
+        ints = np.array([0, 16384, -16384, 32767], dtype='<i2')
+        _write_wav(self.path, 44100, 2, 2, ints.tobytes())
+        rate, data = samples.read_wav(self.path)
+        self.assertEqual(rate, 44100)
+        self.assertEqual(data.shape, (2, 2))
+        self.assertAlmostEqual(data[0, 1], 0.5)
+        self.assertAlmostEqual(data[1, 0], -0.5)
+
+    def test_24bit_mono(self):
+        # -1, 0 and half scale, little-endian three byte samples
+        raw = bytes([0xff, 0xff, 0xff, 0, 0, 0, 0, 0, 0x40])
+        _write_wav(self.path, 48000, 1, 3, raw)
+        _, data = samples.read_wav(self.path)
+        self.assertEqual(data.shape, (3, 1))
+        self.assertAlmostEqual(data[0, 0], -1 / 2 ** 23)
+        self.assertAlmostEqual(data[1, 0], 0)
+        self.assertAlmostEqual(data[2, 0], 0.5)
+
+
+class TestResample(unittest.TestCase):
+
+    def test_sine_survives_rate_change(self):
+        t = np.arange(48000) / 48000
+        data = np.sin(2 * np.pi * 440 * t)[:, None].astype(np.float32)
+        out = samples.resample(data, 48000 / 44100)
+        self.assertEqual(out.shape, (44099, 1))
+        expected = np.sin(2 * np.pi * 440 * np.arange(len(out)) / 44100)
+        error = np.abs(out[100:-100, 0] - expected[100:-100]).max()
+        self.assertLess(error, 1e-3)
+
+    def test_unit_ratio_is_identity(self):
+        data = np.random.uniform(-1, 1, (1000, 2)).astype(np.float32)
+        out = samples.resample(data, 1.0)
+        np.testing.assert_allclose(out, data, atol=1e-5)
+
+
+class TestToPcm(unittest.TestCase):
+
+    def test_mono_to_stereo_int16(self):
+        data = np.array([[0.5], [-1.0]], dtype=np.float32)
+        pcm = samples.to_pcm(data, -16, 2)
+        got = np.frombuffer(pcm, np.int16).tolist()
+        self.assertEqual(got, [16383, 16383, -32767, -32767])
+
+    def test_unsupported_size(self):
+        data = np.zeros((1, 1), dtype=np.float32)
+        with self.assertRaises(samples.UnsupportedFormat):
+            samples.to_pcm(data, 24, 1)
+
+
+class TestPitchShift(unittest.TestCase):
+
+    def test_octave_up_doubles_frequency(self):
+        rate = 44100
+        t = np.arange(rate) / rate
+        data = np.sin(2 * np.pi * 440 * t)[:, None].astype(np.float32)
+        out = samples.pitch_shift(data, 12)
+        self.assertEqual(len(out), rate // 2)
+        spectrum = np.abs(np.fft.rfft(out[:, 0]))
+        peak = np.argmax(spectrum) * rate / len(out)
+        self.assertAlmostEqual(peak, 880, delta=2)
+
+    def test_concurrent_writes_leave_one_file(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        target = os.path.join(directory, 'target.wav')
+        data = np.zeros((1000, 2), dtype=np.float32)
+        with ThreadPoolExecutor(4) as pool:
+            list(pool.map(lambda _: samples.write_wav(target, 44100, data),
+                          range(8)))
+        self.assertEqual(os.listdir(directory), ['target.wav'])
+        self.assertEqual(samples.read_wav(target)[1].shape, (1000, 2))
+
+    def test_synthesize_writes_once(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        source = os.path.join(directory, 'source.wav')
+        target = os.path.join(directory, 'synth', 'target.wav')
+        _write_wav(source, 44100, 1, 2, np.zeros(100, '<i2').tobytes())
+        self.assertEqual(samples.synthesize(source, -3, target), target)
+        mtime = os.path.getmtime(target)
+        samples.synthesize(source, -3, target)
+        self.assertEqual(os.path.getmtime(target), mtime)
+        rate, data = samples.read_wav(target)
+        self.assertEqual((rate, data.shape), (44100, (118, 1)))
+
+
+class TestPreconvert(unittest.TestCase):
+
+    def test_undecodable_files_are_skipped(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        good = os.path.join(directory, 'good.wav')
+        bad = os.path.join(directory, 'bad.wav')
+        _write_wav(good, 22050, 1, 2, np.zeros(100, '<i2').tobytes())
+        with open(bad, 'wb') as f:
+            f.write(b'RIFF')
+
+        # the workers are spawned, so they see the environment not the patch
+        cache_dir = os.path.join(directory, 'cache')
+        with mock.patch.dict(os.environ, {'BANDONEON_CACHE_DIR': cache_dir}), \
+                mock.patch.object(samples, '_CACHE_DIR', cache_dir), \
+                self.assertLogs(level='WARNING'):
+            _, skipped = samples.preconvert([good, bad], (44100, -16, 2), 1)
+            pcm = samples.load_cached(good, (44100, -16, 2))
+        self.assertEqual(skipped, [bad])
+        self.assertEqual(len(pcm), 200 * 2 * 2)
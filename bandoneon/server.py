@@ -0,0 +1,280 @@
+'''
+Unix domain socket input server.
+
+Any number of input sources (button scanner, bellows sensor, test players...)
+connect to the socket and send frames, each holding a batch of messages in
+the usual string format. The server merges every client's state into one
+button/bellows view and feeds the main loop only the changes.
+
+A frame is a network order uint32 payload length and float64 send time (unix
+epoch), followed by the payload: messages separated by newlines. A client may
+name itself with an `id:<name>` message.
+'''
+import logging
+import os
+import queue
+import selectors
+import socket
+import struct
+import threading
+import time
+
+from .message import BellowsMessage, ButtonMessage, InvalidMessage
+
+
+SOCKET_PATH = os.getenv('BANDONEON_SOCKET', '/tmp/bandoneon.sock')
+
+HEADER = struct.Struct('!Id')
+MAX_PAYLOAD = 64 * 1024
+
+_RECV_BYTES = 64 * 1024
+
+
+class InvalidFrame(Exception):
+    pass
+
+
+def encode_frame(msgs, sent=None):
+    '''
+    Pack a list of str messages into one frame.
+    '''
+    payload = '\n'.join(msgs).encode('utf-8')
+    if len(payload) > MAX_PAYLOAD:
+        raise InvalidFrame(f'{len(payload)} byte payload is too large')
+    if sent is None:
+        sent = time.time()
+    return HEADER.pack(len(payload), sent) + payload
+
+
+class FrameDecoder():
+    '''
+    Reassembles frames from a stream of received bytes.
+    '''
+
+    def __init__(self):
+        self._buffer = b''
+
+    def feed(self, data):
+        '''
+        Add received bytes, returning a list of (send time, [str messages])
+        for every frame now complete.
+        '''
+        buffer = self._buffer + data
+        frames = []
+        # walk the buffer and slice it once, rather than once per frame
+        offset = 0
+        while len(buffer) - offset >= HEADER.size:
+            length, sent = HEADER.unpack_from(buffer, offset)
+            if length > MAX_PAYLOAD:
+                raise InvalidFrame(f'{length} byte payload is too large')
+            start = offset + HEADER.size
+            end = start + length
+            if len(buffer) < end:
+                break
+            msgs = buffer[start:end].decode('utf-8', 'replace').split('\n')
+            frames.append((sent, [m for m in msgs if m]))
+            offset = end
+        self._buffer = buffer[offset:]
+        return frames
+
+
+class ClientStats():
+
+    def __init__(self, name):
+        self.name = name
+        self.connected = time.time()
+        self.frames = 0
+        self.messages = 0
+        self.invalid = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+    def str(self):
+        elapsed = max(time.time() - self.connected, 1e-9)
+        mean = self.total_latency / self.frames if self.frames else 0.0
+        return (
+            f'{self.name}: {self.frames} frames, {self.messages} msgs '
+            f'({self.messages / elapsed:.1f}/s), {self.invalid} invalid, '
+            f'latency mean {mean * 1000:.2f}ms '
+            f'max {self.max_latency * 1000:.2f}ms'
+        )
+
+
+class _Client():
+
+    def __init__(self, name):
+        self.decoder = FrameDecoder()
+        self.buttons = set()
+        self.stats = ClientStats(name)
+
+
+class InputState():
+    '''
+    The merged view of every client: a button is pushed if any client has it
+    pushed, and the bellows pressure is the most recently reported one.
+    '''
+
+    def __init__(self):
+        self.clients = []
+        self.pressure = None
+        self._buttons = set()
+
+    def add(self, name):
+        client = _Client(name)
+        self.clients.append(client)
+        return client
+
+    def apply(self, client, msgs):
+        '''
+        Apply one client's batch of str messages, returning the raw messages
+        for the main loop that describe the change in merged state.
+        '''
+        pressure_changed = False
+        for msg in msgs:
+            try:
+                if msg.startswith('id:'):
+                    client.stats.name = msg[3:]
+                elif msg.startswith('btn'):
+                    client.buttons = set(ButtonMessage().parse(msg)
+                                         .active_buttons)
+                elif msg.startswith('blw'):
+                    bellows = BellowsMessage().parse(msg)
+                    if bellows:
+                        self.pressure = bellows.pressure
+                        pressure_changed = True
+                else:
+                    raise InvalidMessage(msg)
+            except (InvalidMessage, ValueError):
+                client.stats.invalid += 1
+        client.stats.messages += len(msgs)
+        return self._changes(pressure_changed)
+
+    def remove(self, client):
+        '''
+        Release a disconnected client's buttons.
+        '''
+        self.clients.remove(client)
+        return self._changes(False)
+
+    def _changes(self, pressure_changed):
+        changes = []
+        buttons = set().union(*(c.buttons for c in self.clients))
+        if buttons != self._buttons:
+            self._buttons = buttons
+            changes.append(ButtonMessage(sorted(buttons)).str().encode())
+        if pressure_changed:
+            changes.append(BellowsMessage(self.pressure).str().encode())
+        return changes
+
+
+class InputServer(threading.Thread):
+    '''
+    Accepts input clients on a Unix domain socket and queues the merged
+    changes for the main loop, read through messages().
+    '''
+
+    def __init__(self, path=SOCKET_PATH):
+        super().__init__(daemon=True)
+        self.path = path
+        self.state = InputState()
+        self._messages = queue.Queue()
+        self._stopped = threading.Event()
+        self._selector = selectors.DefaultSelector()
+
+        if os.path.exists(path):
+            os.remove(path)
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._socket.bind(path)
+        self._socket.listen()
+        self._socket.setblocking(False)
+        self._selector.register(self._socket, selectors.EVENT_READ)
+
+    def messages(self):
+        '''
+        Yield raw messages for the main loop until the server is stopped.
+        '''
+        while True:
+            msg = self._messages.get()
+            if msg is None:
+                return
+            yield msg
+
+    def stats(self):
+        return [c.stats for c in self.state.clients]
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+    def run(self):
+        try:
+            while not self._stopped.is_set():
+                for key, _ in self._selector.select(timeout=0.1):
+                    if key.fileobj is self._socket:
+                        self._accept()
+                    else:
+                        self._read(key.fileobj, key.data)
+        finally:
+            for key in list(self._selector.get_map().values()):
+                key.fileobj.close()
+            self._selector.close()
+            os.remove(self.path)
+            self._messages.put(None)
+
+    def _accept(self):
+        conn, _ = self._socket.accept()
+        conn.setblocking(False)
+        client = self.state.add(f'client-{conn.fileno()}')
+        self._selector.register(conn, selectors.EVENT_READ, client)
+        logging.info(f'Input client connected: {client.stats.name}')
+
+    def _read(self, conn, client):
+        try:
+            data = conn.recv(_RECV_BYTES)
+            frames = client.decoder.feed(data) if data else None
+        except (OSError, InvalidFrame) as e:
+            logging.warning(f'Dropping {client.stats.name}: {e}')
+            frames = None
+        if frames is None:
+            self._drop(conn, client)
+            return
+
+        received = time.time()
+        for sent, msgs in frames:
+            latency = received - sent
+            client.stats.frames += 1
+            client.stats.total_latency += latency
+            client.stats.max_latency = max(client.stats.max_latency, latency)
+            for change in self.state.apply(client, msgs):
+                self._messages.put(change)
+
+    def _drop(self, conn, client):
+        self._selector.unregister(conn)
+        conn.close()
+        logging.info(f'Input client disconnected: {client.stats.str()}')
+        for change in self.state.remove(client):
+            self._messages.put(change)
+
+
+class InputClient():
+    '''
+    Connects an input source to the server. Messages are buffered by send()
+    and written as a single frame by flush().
+    '''
+
+    def __init__(self, name, path=SOCKET_PATH):
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._socket.connect(path)
+        self._pending = [f'id:{name}']
+
+    def send(self, msg):
+        self._pending.append(msg)
+
+    def flush(self):
+        if self._pending:
+            self._socket.sendall(encode_frame(self._pending))
+            self._pending = []
+
+    def close(self):
+        self.flush()
+        self._socket.close()
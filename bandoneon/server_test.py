@@ -0,0 +1,86 @@
+import os
+import tempfile
+import time
+import unittest
+
+from . import server
+
+
+class TestFrames(unittest.TestCase):
+
+    def test_round_trip_in_pieces(self):
+        data = (server.encode_frame(['btn:1,2', 'blw:100'], sent=1.5)
+                + server.encode_frame(['btn:'], sent=2.5))
+        decoder = server.FrameDecoder()
+        self.assertEqual(decoder.feed(data[:5]), [])
+        got = decoder.feed(data[5:])
+        self.assertEqual(got, [(1.5, ['btn:1,2', 'blw:100']), (2.5, ['btn:'])])
+
+    def test_many_frames_and_a_partial_one(self):
+        data = b''.join(server.encode_frame([f'blw:{i}'], sent=float(i))
+                        for i in range(1000))
+        decoder = server.FrameDecoder()
+        got = decoder.feed(data[:-3])
+        self.assertEqual(len(got), 999)
+        self.assertEqual(got[-1], (998.0, ['blw:998']))
+        self.assertEqual(decoder.feed(data[-3:]), [(999.0, ['blw:999'])])
+
+    def test_oversized_frame(self):
+        header = server.HEADER.pack(server.MAX_PAYLOAD + 1, 0.0)
+        with self.assertRaises(server.InvalidFrame):
+            server.FrameDecoder().feed(header)
+
+
+class TestInputState(unittest.TestCase):
+
+    def test_buttons_merge_across_clients(self):
+        state = server.InputState()
+        left = state.add('left')
+        right = state.add('right')
+        self.assertEqual(state.apply(left, ['btn:1,2']), [b'btn:1,2'])
+        self.assertEqual(state.apply(right, ['btn:40']), [b'btn:1,2,40'])
+        # no change in the merged view, nothing to send
+        self.assertEqual(state.apply(right, ['btn:40']), [])
+        self.assertEqual(state.remove(left), [b'btn:40'])
+
+    def test_batch_is_coalesced(self):
+        state = server.InputState()
+        client = state.add('player')
+        got = state.apply(client, ['btn:1', 'blw:10', 'btn:2', 'blw:-20'])
+        self.assertEqual(got, [b'btn:2', b'blw:-20'])
+
+    def test_invalid_messages_are_counted(self):
+        state = server.InputState()
+        client = state.add('fuzz')
+        got = state.apply(client, ['id:sensor', 'garbage', 'btn:1,,2'])
+        self.assertEqual(got, [])
+        self.assertEqual(client.stats.invalid, 2)
+        self.assertEqual(client.stats.name, 'sensor')
+
+
+class TestInputServer(unittest.TestCase):
+
+    def test_clients_feed_messages(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(os.rmdir, directory)
+        path = os.path.join(directory, 'test.sock')
+        input_server = server.InputServer(path)
+        input_server.start()
+        buttons = server.InputClient('buttons', path)
+        bellows = server.InputClient('bellows', path)
+        buttons.send('btn:3')
+        buttons.flush()
+        bellows.send('blw:50')
+        bellows.flush()
+
+        messages = input_server.messages()
+        got = {next(messages), next(messages)}
+        self.assertEqual(got, {b'btn:3', b'blw:50'})
+
+        buttons.close()
+        self.assertEqual(next(messages), b'btn:')
+        bellows.close()
+        time.sleep(0.05)
+        input_server.stop()
+        self.assertEqual(list(messages), [])
+        self.assertFalse(os.path.exists(path))
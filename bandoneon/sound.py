@@ -3,17 +3,26 @@ Sound wraps pygame and a few other conveniences.
 '''
 from abc import ABC, abstractmethod
 import logging
+import os
+import time
 
 import pygame
 
+from . import loudness, mixer, profiler, samples
 
-pygame.mixer.init()
-# to allow for more than just the actual notes being played
-pygame.mixer.set_num_channels(16)
+
+# file name: normalization gain, from the offline loudness analysis
+_gains = {}
 
 
 class SoundABC(ABC):
 
+    @classmethod
+    def init(cls):
+        '''
+        Prepare the sound backend, once before any sound is created.
+        '''
+
     @abstractmethod
     def play(self, loops):
         pass
@@ -33,22 +42,38 @@ class Sound(SoundABC):
     # file_path: <Sound> instance
     _cache_ = {}
 
+    @classmethod
+    def init(cls):
+        global _gains
+        # calibration may have started the mixer already
+        if not pygame.mixer.get_init():
+            mixer.init_mixer()
+        _gains = loudness.load_gains()
+
     def __init__(self, file_path):
         self.file_path = file_path
+        self.gain = _gains.get(os.path.basename(file_path), 1.0)
         self._sound = None
-        self._sound = pygame.mixer.Sound(file_path)
+        pcm = samples.load_cached(file_path, pygame.mixer.get_init())
+        if pcm is not None:
+            self._sound = pygame.mixer.Sound(buffer=pcm)
+        else:
+            self._sound = pygame.mixer.Sound(file_path)
         self._channel = None
 
     def play(self, loops=-1):
         logging.debug(f'Playing {self.file_path}')
         self._channel = self._sound.play(loops)
+        if self._channel is None:
+            mixer.stats.voice_overflows += 1
+            logging.warning(f'No free channel for {self.file_path}')
         return self._channel
 
     def stop(self):
         self._sound.stop()
 
     def set_volume(self, volume):
-        self._sound.set_volume(volume)
+        self._sound.set_volume(volume * self.gain)
 
 
 class SoundStub(SoundABC):
@@ -70,8 +95,15 @@ _cached_sounds = {}
 
 
 def get_sound(file_path, sound_class):
+    # The pipeline calls this from several loader threads without a lock. Two
+    # of them may load the same file at once, and the counters may lose an
+    # update; neither matters, and the cache never holds a partial sound.
     if file_path in _cached_sounds:
+        profiler.stats.cache_hits += 1
         return _cached_sounds[file_path]
+    start = time.perf_counter()
     s = sound_class(file_path)
+    profiler.stats.load_seconds += time.perf_counter() - start
+    profiler.stats.cache_misses += 1
     _cached_sounds[file_path] = s
     return s
@@ -1,11 +1,14 @@
 import logging
 import sys
 
-from bandoneon import start_loop
+from bandoneon import mixer, start_loop
 
 
 if __name__ == '__main__':
     if 'debug' in sys.argv:
         logging.basicConfig(level=logging.DEBUG)
-        
+
+    if 'calibrate' in sys.argv:
+        mixer.calibrate()
+
     start_loop()
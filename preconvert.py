@@ -0,0 +1,71 @@
+'''
+Decode every sample under SOUND_DIRECTORY, plus any notes the layout needs
+synthesized, into the mixer's native PCM format with a process pool, writing
+the results to the sample cache so later boots can skip decoding.
+
+Reports the per-stage timings and the load time against serial decoding.
+'''
+import argparse
+import logging
+import os
+import time
+
+import pygame
+
+from bandoneon import button, mixer, samples
+
+
+def _timed_load(file_paths, load):
+    start = time.perf_counter()
+    for path in file_paths:
+        load(path)
+    return time.perf_counter() - start
+
+
+def _load_cached(path):
+    pcm = samples.load_cached(path, pygame.mixer.get_init())
+    if pcm is None:
+        return pygame.mixer.Sound(path)
+    return pygame.mixer.Sound(buffer=pcm)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                        help='size of the process pool')
+    parser.add_argument('--debug', action='store_true')
+    args = parser.parse_args()
+
+    if args.debug:
+        logging.basicConfig(level=logging.DEBUG)
+
+    mixer.init_mixer(monitor=False)
+    file_paths = sorted(
+        os.path.join(button._SOUND_DIR, f)
+        for f in os.listdir(button._SOUND_DIR)
+        if f.lower().endswith('.wav')
+    )
+    button.init_buttons(args.workers)
+    synthesized = [path for paths in button._synth_map.values()
+                   for path in paths]
+    print(f'{len(synthesized)} synthesized samples')
+    file_paths += synthesized
+    fmt = pygame.mixer.get_init()
+    print(f'{len(file_paths)} samples, mixer format {fmt}')
+
+    serial = _timed_load(file_paths, pygame.mixer.Sound)
+    print(f'serial load:     {serial:.2f}s')
+
+    start = time.perf_counter()
+    stages, skipped = samples.preconvert(file_paths, fmt, args.workers)
+    convert = time.perf_counter() - start
+    print(f'preconvert:      {convert:.2f}s on {args.workers} workers')
+    for stage, seconds in stages.items():
+        print(f'  {stage:9} {seconds:.2f}s (summed over workers)')
+    for path in skipped:
+        print(f'  skipped {path}, pygame will decode it at load time')
+
+    cached = _timed_load(file_paths, _load_cached)
+    print(f'cached load:     {cached:.2f}s')
+    if cached:
+        print(f'speedup:         {serial / cached:.1f}x')
@@ -0,0 +1,55 @@
+'''
+Replay a recorded input journal through the main loop and report how long
+each event took to process.
+
+Record a journal by running the main program with BANDONEON_JOURNAL set, eg.
+
+    BANDONEON_JOURNAL=session.jnl python main.py
+    python replay.py session.jnl --speed 10
+
+Replays use the silent SoundStub unless --real is given.
+'''
+import argparse
+import logging
+import statistics
+
+from bandoneon import start_loop
+from bandoneon.journal import replay, timed
+from bandoneon.sound import Sound, SoundStub
+
+
+def report(timings, verbose=False):
+    if not timings:
+        print('No events replayed')
+        return
+    if verbose:
+        for msg, seconds in timings:
+            print(f'{seconds * 1000:8.3f}ms  {msg.decode("utf-8", "replace")}')
+    durations = sorted(seconds for _, seconds in timings)
+    p99 = durations[min(len(durations) - 1, int(len(durations) * 0.99))]
+    print(f'events: {len(durations)}')
+    print(f'mean:   {statistics.mean(durations) * 1000:.3f}ms')
+    print(f'median: {statistics.median(durations) * 1000:.3f}ms')
+    print(f'p99:    {p99 * 1000:.3f}ms')
+    print(f'max:    {durations[-1] * 1000:.3f}ms')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('journal')
+    parser.add_argument('--speed', type=float, default=1.0,
+                        help='replay speed multiplier, 0 for as fast as possible')
+    parser.add_argument('--real', action='store_true',
+                        help='play through the real sound backend')
+    parser.add_argument('--verbose', action='store_true',
+                        help='print the timing of every event')
+    parser.add_argument('--debug', action='store_true')
+    args = parser.parse_args()
+
+    if args.debug:
+        logging.basicConfig(level=logging.DEBUG)
+
+    timings = []
+    source = timed(replay(args.journal, args.speed), timings)
+    start_loop(source, Sound if args.real else SoundStub)
+    report(timings, args.verbose)
@@ -0,0 +1,210 @@
+'''
+Load and fuzz test the main loop through the real POSIX message queue.
+
+Generates random (valid) or adversarial (out of range, malformed and garbage)
+button/bellows messages at a target rate, sends them through the queue to a
+main loop running in a separate process, as it would in production, and
+reports the sustained throughput, messages that found the queue full,
+dropped messages and per-message loop latency.
+
+    python stress.py --rate 2000 --seconds 10 --mode adversarial
+'''
+import argparse
+import logging
+import multiprocessing
+import os
+from queue import Empty
+import random
+import statistics
+import sys
+import time
+
+from posix_ipc import BusyError, MessageQueue, O_CREAT
+
+import bandoneon
+from bandoneon import MESSAGE_Q_PATH, button, profiler, start_loop
+from bandoneon.journal import timed
+from bandoneon.sound import Sound, SoundStub
+
+
+RANDOM = 'random'
+ADVERSARIAL = 'adversarial'
+
+# Seconds without a message before the consumer assumes the run is over
+_IDLE_TIMEOUT = 1.0
+# Seconds the consumer may take to start, which may include synthesis, and to
+# report back once the sender is done
+_STARTUP_TIMEOUT = 120.0
+_REPORT_TIMEOUT = 30.0
+# Seconds between checks that the consumer is still alive
+_CHECK_INTERVAL = 0.1
+
+
+def random_message(rng):
+    if rng.random() < 0.5:
+        keys = rng.sample(sorted(button._buttons), rng.randint(0, 6))
+        return f'btn:{",".join(str(k) for k in keys)}'.encode()
+    return f'blw:{rng.randint(-127, 127)}'.encode()
+
+
+def adversarial_message(rng):
+    kind = rng.randrange(7)
+    if kind == 0:
+        keys = [rng.randint(len(button._buttons), 10 ** 6) for _ in range(3)]
+        return f'btn:{",".join(str(k) for k in keys)}'.encode()
+    if kind == 1:
+        # every button at once, far beyond the mixer's voices
+        return f'btn:{",".join(str(k) for k in button._buttons)}'.encode()
+    if kind == 2:
+        return rng.choice([b'btn:1,,2', b'btn:,', b'blw:-', b'blw:5-5'])
+    if kind == 3:
+        return f'blw:{rng.randint(-10 ** 9, 10 ** 9)}'.encode()
+    if kind == 4:
+        return os.urandom(rng.randint(1, 64))
+    if kind == 5:
+        return rng.choice([b'', b'btn', b'blw', b'\x00btn:1'])
+    return random_message(rng)
+
+
+def _queue_source(ready, stopped):
+    '''
+    Yield from the real message queue until the sender is done and the queue
+    has been idle, setting ready once the main loop starts reading.
+    '''
+    queue = bandoneon._open_queue()
+    ready.set()
+    while True:
+        try:
+            msg, _ = queue.receive(_IDLE_TIMEOUT)
+        except BusyError:
+            if stopped.is_set():
+                return
+            continue
+        yield msg
+
+
+def consume(real, debug, ready, stopped, results):
+    '''
+    Consumer process, runs the main loop on the message queue and puts
+    ([loop seconds per message], invalid message count) on results.
+    '''
+    logging.basicConfig(level=logging.DEBUG if debug else logging.ERROR)
+    timings = []
+    start_loop(timed(_queue_source(ready, stopped), timings),
+               Sound if real else SoundStub)
+    results.put(([seconds for _, seconds in timings], profiler.stats.invalid))
+
+
+def _fail(consumer, reason):
+    if consumer.is_alive():
+        # SDL handles SIGTERM, so only SIGKILL reliably stops it
+        consumer.kill()
+    consumer.join()
+    sys.exit(f'Consumer {reason} (exit code {consumer.exitcode})')
+
+
+def wait_ready(consumer, ready):
+    deadline = time.perf_counter() + _STARTUP_TIMEOUT
+    while not ready.wait(_CHECK_INTERVAL):
+        if not consumer.is_alive():
+            _fail(consumer, 'exited before reading messages')
+        if time.perf_counter() > deadline:
+            _fail(consumer, 'did not start reading messages')
+
+
+def wait_results(consumer, results):
+    deadline = time.perf_counter() + _REPORT_TIMEOUT
+    while True:
+        # anything a dead consumer put has been flushed before it exited
+        exited = not consumer.is_alive()
+        try:
+            return results.get(timeout=_CHECK_INTERVAL)
+        except Empty:
+            if exited:
+                _fail(consumer, 'exited without reporting')
+            if time.perf_counter() > deadline:
+                _fail(consumer, 'did not report back')
+
+
+def send(queue, rng, generate, rate, seconds):
+    '''
+    Send messages at rate for seconds. A message that finds the queue full is
+    retried until the next one is due, then dropped.
+
+    Returns (sent, messages that found the queue full, dropped).
+    '''
+    sent = full = dropped = 0
+    interval = 1 / rate
+    start = time.perf_counter()
+    due = start
+    while due - start < seconds:
+        msg = generate(rng)
+        due += interval
+        blocked = False
+        while True:
+            try:
+                queue.send(msg, timeout=0)
+                sent += 1
+                break
+            except BusyError:
+                if not blocked:
+                    blocked = True
+                    full += 1
+                if time.perf_counter() >= due:
+                    dropped += 1
+                    break
+                time.sleep(0)
+        delay = due - time.perf_counter()
+        if delay > 0.001:
+            time.sleep(delay)
+    return sent, full, dropped
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--rate', type=float, default=200,
+                        help='messages per second to send')
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--mode', choices=[RANDOM, ADVERSARIAL], default=RANDOM)
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--real', action='store_true',
+                        help='play through the real sound backend')
+    parser.add_argument('--debug', action='store_true')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.DEBUG if args.debug else logging.ERROR)
+
+    button.init_buttons()
+    rng = random.Random(args.seed)
+    generate = random_message if args.mode == RANDOM else adversarial_message
+    queue = MessageQueue(MESSAGE_Q_PATH, flags=O_CREAT, max_messages=1,
+                         read=False, write=True)
+
+    # spawn rather than fork, so the consumer starts up like the real program
+    context = multiprocessing.get_context('spawn')
+    ready = context.Event()
+    stopped = context.Event()
+    results = context.Queue()
+    consumer = context.Process(
+        target=consume,
+        args=(args.real, args.debug, ready, stopped, results))
+    consumer.start()
+    wait_ready(consumer, ready)
+
+    start = time.perf_counter()
+    sent, full, dropped = send(queue, rng, generate, args.rate, args.seconds)
+    elapsed = time.perf_counter() - start
+    stopped.set()
+    timings, invalid = wait_results(consumer, results)
+    consumer.join()
+
+    latencies = sorted(timings)
+    print(f'target rate:   {args.rate:.0f} msgs/s ({args.mode})')
+    print(f'sent:          {sent} ({sent / elapsed:.0f} msgs/s sustained)')
+    print(f'queue full:    {full} messages')
+    print(f'dropped:       {dropped}')
+    print(f'processed:     {len(latencies)}, {invalid} invalid')
+    if latencies:
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+        print(f'loop latency:  mean {statistics.mean(latencies) * 1000:.3f}ms '
+              f'p99 {p99 * 1000:.3f}ms max {latencies[-1] * 1000:.3f}ms')
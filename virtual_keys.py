@@ -6,7 +6,7 @@ import os
 
 from posix_ipc import MessageQueue, O_CREAT
 
-from bandoneon import button, MESSAGE_Q_PATH
+from bandoneon import layout, MESSAGE_Q_PATH
 from bandoneon.message import ButtonMessage, BellowsMessage
 
 
@@ -27,15 +27,9 @@ KEYBOARD_MAP = {
     'k': 72
 }
 
-# Build up a midi map buttons
-MIDI_TO_KEY_DRAW = {
-    button.draw_note.midi: button.key_number
-    for button in button._buttons.values()
-}
-MIDI_TO_KEY_PUSH = {
-    button.push_note.midi: button.key_number
-    for button in button._buttons.values()
-}
+# MIDI note to every key playing it
+MIDI_TO_KEY_DRAW = layout.load().midi_to_keys[layout.DRAW]
+MIDI_TO_KEY_PUSH = layout.load().midi_to_keys[layout.PUSH]
 
 messageQueue = MessageQueue(MESSAGE_Q_PATH, flags=O_CREAT, max_messages=1,
                             read=False, write=True)
@@ -45,7 +39,7 @@ def play_key(keyboard_key):
     if keyboard_key not in KEYBOARD_MAP:
         return
     midi_note = KEYBOARD_MAP[keyboard_key]
-    bandoneon_key = MIDI_TO_KEY_PUSH[midi_note]
+    bandoneon_key = MIDI_TO_KEY_PUSH[midi_note][0]
     msg = ButtonMessage(active_buttons=[bandoneon_key])
     messageQueue.send(msg.str())
 
@@ -12,22 +12,16 @@ import time
 import mido
 from posix_ipc import MessageQueue, O_CREAT
 
-from bandoneon import button, MESSAGE_Q_PATH
+from bandoneon import layout, MESSAGE_Q_PATH
 from bandoneon.message import ButtonMessage, BellowsMessage
 
 
 CUMPARSITA = 'cumparsita.mid'
 BANDONEON_CHANNELS = set([3, 4, 7])  # the only bandoneon channels in the file
 
-# Build up a midi map buttons
-MIDI_TO_KEY_DRAW = {
-    button.draw_note.midi: button.key_number
-    for button in button._buttons.values()
-}
-MIDI_TO_KEY_PUSH = {
-    button.push_note.midi: button.key_number
-    for button in button._buttons.values()
-}
+# MIDI note to every key playing it
+MIDI_TO_KEY_DRAW = layout.load().midi_to_keys[layout.DRAW]
+MIDI_TO_KEY_PUSH = layout.load().midi_to_keys[layout.PUSH]
 
 
 messageQueue = MessageQueue(MESSAGE_Q_PATH, flags=O_CREAT, max_messages=1,
@@ -91,7 +85,7 @@ def write_notes(notes, direction):
     }[direction]
 
     # sometimes we get impossible notes?
-    keys = [map_[n] for n in notes if n in map_]
+    keys = [map_[n][0] for n in notes if n in map_]
     logging.debug(f'Playing keys: {keys} for notes: {notes} ({direction})')
 
     # report on bad notes: